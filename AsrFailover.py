@@ -0,0 +1,157 @@
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
+
+from custom_speech_recognition.exceptions import TranscriptionFailed
+from WhisperApiClient import UNHEALTHY_P95_SECONDS
+
+FAILOVER_PRELOAD_LOCAL = False  # load the local model at startup instead of when the API first looks unhealthy
+FAILOVER_PROBE_SECONDS = 30  # while failed over, how often a copy of a request is sent to the API to check on it
+# If an API request hasn't answered after HEDGE_AFTER_SECONDS, the same audio is also sent to the local
+# model (or as a second API request while no local model is loaded) and the first answer wins.
+# None disables hedging.
+HEDGE_AFTER_SECONDS = None
+
+
+def copy_buffer(wav_buffer):
+    # Requests that can outlive the caller's turn get their own buffer, since the per-source one is reused.
+    buffer = io.BytesIO(wav_buffer.getvalue())
+    buffer.name = wav_buffer.name
+    return buffer
+
+
+class ApiFailover:
+    """
+    Moves transcription from ``WhisperApiClient`` to a local Whisper model, loaded in the background on first
+    need, while the API is unhealthy. A probe every ``FAILOVER_PROBE_SECONDS`` switches back.
+    """
+
+    def __init__(self, api_client, load_local, local_model_name, workers):
+        self.api_client = api_client
+        self.load_local = load_local
+        self.local_model_name = local_model_name
+        self.local_whisper = None
+        self.local_loading = False
+        self.failed_over = False
+        self.last_probe = 0.0
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix="asr-failover")
+        self.stats = {"failovers": 0, "local_requests": 0, "hedged_requests": 0, "hedges_won": 0}
+        if FAILOVER_PRELOAD_LOCAL:
+            self.start_local_backend()
+
+    def transcribe(self, wav_buffer, local_audio):
+        """
+        Transcribes ``wav_buffer`` through whichever backend is healthy. ``local_audio`` is called
+        for the local model's input only when it is actually used.
+        """
+        if self.failed_over:
+            self.maybe_probe(wav_buffer)
+            return self.transcribe_local(local_audio)
+        try:
+            text = self.transcribe_api(wav_buffer, local_audio)
+        except TranscriptionFailed:
+            self.check_health()
+            if self.local_whisper is None:
+                raise
+            return self.transcribe_local(local_audio)
+        self.check_health()
+        return text
+
+    def transcribe_api(self, wav_buffer, local_audio):
+        if HEDGE_AFTER_SECONDS is None:
+            return self.api_client.transcribe(wav_buffer)
+        primary = self.executor.submit(self.api_client.transcribe, copy_buffer(wav_buffer))
+        try:
+            return primary.result(timeout=HEDGE_AFTER_SECONDS)
+        except FuturesTimeout:
+            pass
+
+        self.count("hedged_requests")
+        if self.local_whisper is not None:
+            hedge = self.executor.submit(self.transcribe_local, local_audio)
+        else:
+            hedge = self.executor.submit(self.api_client.transcribe, copy_buffer(wav_buffer))
+        # The slower request is left to finish on its own, its answer is simply ignored.
+        for future in as_completed([primary, hedge]):
+            if future.exception() is None:
+                if future is hedge:
+                    self.count("hedges_won")
+                return future.result()
+        raise primary.exception()
+
+    def transcribe_local(self, local_audio):
+        self.count("local_requests")
+        return self.local_whisper.transcribe(local_audio(), self.local_model_name)
+
+    def check_health(self):
+        if self.failed_over or self.api_client.is_healthy():
+            return
+        if self.local_whisper is None:
+            self.start_local_backend()
+            return
+        with self.lock:
+            if self.failed_over:
+                return
+            self.failed_over = True
+            self.last_probe = time.monotonic()
+            self.stats["failovers"] += 1
+        print(f'[WARN] Whisper API is unhealthy, transcribing with local Whisper ({self.local_model_name}).')
+
+    def start_local_backend(self):
+        with self.lock:
+            if self.local_loading:
+                return
+            self.local_loading = True
+        print(f'[INFO] Loading local Whisper ({self.local_model_name}) as a fallback for the API.')
+        threading.Thread(target=self.load_local_backend, daemon=True).start()
+
+    def load_local_backend(self):
+        try:
+            self.local_whisper = self.load_local(self.local_model_name)
+        except Exception as e:
+            print('[ERROR] Could not load local Whisper for failover.')
+            print(e)
+            return
+        # The API may have gone bad while the model was loading.
+        self.check_health()
+
+    def maybe_probe(self, wav_buffer):
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_probe < FAILOVER_PROBE_SECONDS:
+                return
+            self.last_probe = now
+        self.executor.submit(self.probe_api, copy_buffer(wav_buffer))
+
+    def probe_api(self, wav_buffer):
+        start = time.monotonic()
+        try:
+            self.api_client.transcribe(wav_buffer)
+        except Exception:
+            return
+        if time.monotonic() - start >= UNHEALTHY_P95_SECONDS:
+            return
+        # Start from a clean window, otherwise the failures that caused the failover would trip it again.
+        self.api_client.reset_health()
+        with self.lock:
+            self.failed_over = False
+        print('[INFO] Whisper API has recovered, switching back from local Whisper.')
+
+    def count(self, name):
+        # Requests come in from every transcription worker at once.
+        with self.lock:
+            self.stats[name] += 1
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["failed_over"] = self.failed_over
+        if self.local_whisper is not None:
+            stats["local_real_time_factor"] = self.local_whisper.real_time_factor()
+        return stats
+
+    def close(self):
+        # The local model belongs to whoever provided load_local and is closed there.
+        self.executor.shutdown(wait=False)
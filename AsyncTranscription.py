@@ -0,0 +1,198 @@
+import asyncio
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from AudioTranscriber import (USE_API, LOCAL_MODEL, MAX_REQUEUES, OFFLINE_SPOOL, REQUEUE_DELAY_SECONDS, named_bytes_io,
+                              stitch_transcripts)
+from custom_speech_recognition.exceptions import TranscriptionFailed
+
+USE_ASYNC_PIPELINE = False  # use AsyncTranscriptionPipeline instead of AudioTranscriber.transcribe_audio_queue
+MAX_IN_FLIGHT = 4  # transcription requests allowed in flight at once, across all speakers
+
+
+class AsyncAudioQueue:
+    """
+    Bounded audio queue that capture threads fill without blocking and an asyncio loop awaits, with the
+    ``put_nowait``/``get_nowait``/``qsize`` subset of ``queue.Queue`` the recorders use.
+    """
+
+    def __init__(self, maxsize=0):
+        self.maxsize = maxsize
+        self.items = deque()
+        self.loop = None
+        self.not_empty = None
+
+    def bind(self, loop):
+        # The event has to exist before put_nowait can see the loop and schedule a set() on it.
+        self.not_empty = asyncio.Event()
+        if self.items:
+            self.not_empty.set()
+        self.loop = loop
+
+    def put_nowait(self, item):
+        if self.maxsize and len(self.items) >= self.maxsize:
+            raise queue.Full
+        self.items.append(item)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.not_empty.set)
+
+    def get_nowait(self):
+        try:
+            return self.items.popleft()
+        except IndexError:
+            raise queue.Empty
+
+    def qsize(self):
+        return len(self.items)
+
+    async def get(self):
+        while not self.items:
+            self.not_empty.clear()
+            if self.items:  # an item may have landed between the check and the clear
+                break
+            await self.not_empty.wait()
+        return self.items.popleft()
+
+
+class AsyncTranscriptionPipeline:
+    """
+    asyncio alternative to ``AudioTranscriber.transcribe_audio_queue``. Each speaker's chunks are applied in
+    capture order, with at most ``max_in_flight`` requests at once, and a request is cancelled once its phrase grows.
+    """
+
+    def __init__(self, transcriber, max_in_flight=MAX_IN_FLIGHT):
+        self.transcriber = transcriber
+        self.max_in_flight = max_in_flight
+        self.executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="async-transcriber")
+        self.stats = {"in_flight": 0, "completed": 0, "cancelled": 0, "failed": 0, "retried": 0}
+        self.loop = None
+        self.main_task = None
+        self.api_session = None
+        self.semaphore = None
+        self.lanes = {}
+        self.thread = None
+
+    def start(self, audio_queue):
+        self.thread = threading.Thread(target=asyncio.run, args=(self.run(audio_queue),), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the pipeline from any thread. In-flight requests are cancelled and the API session is closed."""
+        if self.loop is not None and self.main_task is not None:
+            self.loop.call_soon_threadsafe(self.main_task.cancel)
+
+    async def run(self, audio_queue):
+        self.loop = asyncio.get_running_loop()
+        self.main_task = asyncio.current_task()
+        self.semaphore = asyncio.Semaphore(self.max_in_flight)
+        audio_queue.bind(self.loop)
+        lane_tasks = []
+        try:
+            if USE_API:
+                await self.open_api_session()
+            for who_spoke in self.transcriber.audio_sources:
+                self.lanes[who_spoke] = asyncio.Queue()
+                lane_tasks.append(asyncio.create_task(self.run_lane(who_spoke)))
+
+            while self.transcriber.should_continue:
+                who_spoke, data, time_spoken = await audio_queue.get()
+                self.lanes[who_spoke].put_nowait((data, time_spoken))
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for task in lane_tasks:
+                task.cancel()
+            await asyncio.gather(*lane_tasks, return_exceptions=True)
+            if self.api_session is not None:
+                await self.api_session.close()
+            self.executor.shutdown(wait=False)
+            print('No longer transcribing audio.')
+
+    async def open_api_session(self):
+        import aiohttp
+        import openai
+        # Tasks copy the current context when they are created, so every request shares this pool.
+        self.api_session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_in_flight))
+        openai.aiosession.set(self.api_session)
+
+    async def run_lane(self, who_spoke):
+        transcriber = self.transcriber
+        source_info = transcriber.audio_sources[who_spoke]
+        lane = self.lanes[who_spoke]
+        task = None
+        while True:
+            chunks = [await lane.get()]
+            while not lane.empty():
+                chunks.append(lane.get_nowait())
+
+            buffer_changed = False
+            for data, time_spoken in chunks:
+                if transcriber.needs_flush_before(source_info, data, time_spoken):
+                    if buffer_changed:
+                        task = self.start_request(who_spoke, last_time_spoken)
+                    if task is not None:
+                        await asyncio.wait([task])
+                elif task is not None and not task.done():
+                    task.cancel()
+                    self.stats["cancelled"] += 1
+                transcriber.update_last_sample_and_phrase_status(who_spoke, data, time_spoken)
+                buffer_changed = True
+                last_time_spoken = time_spoken
+            task = self.start_request(who_spoke, last_time_spoken)
+
+    def start_request(self, who_spoke, time_spoken):
+        source_info = self.transcriber.audio_sources[who_spoke]
+        # Each request gets its own buffer, since a cancelled request may still be reading the previous one.
+        audio = self.transcriber.process_data(who_spoke, source_info["last_sample"],
+                                              named_bytes_io(f"{who_spoke}.wav"))
+        return asyncio.create_task(self.transcribe(who_spoke, audio, time_spoken))
+
+    async def transcribe(self, who_spoke, audio, time_spoken):
+        # A request is cancelled as soon as its phrase grows, so while it runs last_sample still holds exactly
+        # its audio. A failure is retried like AudioTranscriber.requeue does, then the audio is spooled, since
+        # the lane resets last_sample once the next phrase starts.
+        for attempt in range(MAX_REQUEUES + 1):
+            try:
+                text = await self.request(audio)
+                break
+            except TranscriptionFailed as e:
+                self.stats["failed"] += 1
+                if USE_API and OFFLINE_SPOOL:
+                    from WhisperApiClient import is_connection_failure
+                    if is_connection_failure(e):
+                        self.transcriber.go_offline(who_spoke, e)
+                        return
+                if attempt == MAX_REQUEUES:
+                    if USE_API and OFFLINE_SPOOL:
+                        print(f'[WARN] Spooling audio from {who_spoke} after {MAX_REQUEUES} retries: {e}')
+                        self.transcriber.spool_failed_audio(who_spoke)
+                    else:
+                        print(f'[ERROR] Giving up on audio from {who_spoke} after {MAX_REQUEUES} retries: {e}')
+                    return
+                print(f'[WARN] Transcription failed for {who_spoke}, retrying in {REQUEUE_DELAY_SECONDS}s: {e}')
+                self.stats["retried"] += 1
+                await asyncio.sleep(REQUEUE_DELAY_SECONDS)
+        self.stats["completed"] += 1
+        self.apply_result(who_spoke, text, time_spoken)
+
+    async def request(self, audio):
+        async with self.semaphore:
+            self.stats["in_flight"] += 1
+            try:
+                if USE_API:
+                    return await self.transcriber.api_client.atranscribe(audio)
+                return await self.loop.run_in_executor(
+                    self.executor, self.transcriber.local_whisper.transcribe, audio, LOCAL_MODEL)
+            finally:
+                self.stats["in_flight"] -= 1
+
+    def apply_result(self, who_spoke, text, time_spoken):
+        if text == '' or text.lower() == 'you':
+            return
+        source_info = self.transcriber.audio_sources[who_spoke]
+        source_info["last_text"] = text
+        self.transcriber.update_transcript(who_spoke, stitch_transcripts(source_info["committed_text"], text),
+                                           time_spoken)
+        self.transcriber.notify_transcript_changed()
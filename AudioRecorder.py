@@ -1,57 +1,281 @@
 import custom_speech_recognition as sr
+from custom_speech_recognition import pcm
 import pyaudiowpatch as pyaudio
+import numpy as np
+import queue
+import threading
+import time
 from datetime import datetime
 
 RECORD_TIMEOUT = 3
 ENERGY_THRESHOLD = 1000
 DYNAMIC_ENERGY_THRESHOLD = False
+# Ambient noise listened to per device: before capture starts for a device with no cached threshold, or from
+# the live capture to refine a cached one.
+CALIBRATION_SECONDS = 1
+# A cached threshold is only refined from buffers quieter than it, and moves at most this factor either way
+# per call, so speech at the start of a call can't ratchet it up.
+MAX_REFINE_FACTOR = 2
+VOICE_ACTIVITY_DETECTION = True  # drop phrases that are loud but not speech (keyboard, fans) before they're queued
+MAX_AUDIO_QUEUE_SIZE = 100  # chunks waiting to be dispatched to the transcriber
+# Devices are captured in PortAudio callback mode into a ring buffer this long, see sr.Microphone. It has to
+# outlast a phrase (RECORD_TIMEOUT plus the silence listen() keeps), since phrases are views into it until joined.
+RING_BUFFER_SECONDS = 30
+# Audio per read from either device. `python -m custom_speech_recognition.benchmark` profiles listen() on a
+# 48 kHz stereo loopback at 41% of a core for 2-frame reads, 0.7% at 10 ms and 0.25% at 64 ms.
+CAPTURE_LATENCY_MS = 64
+CAPTURE_SAMPLE_RATE = 16000  # loopback audio is downmixed and resampled to this as it's read, Whisper needs no more
+
+# Echo suppression: without headphones the mic hears the customer through the speakers. Mic chunks whose
+# energy envelope follows the loopback audio are treated as echo. Their echo frames are silenced, and the
+# chunk is dropped if less than ECHO_MIN_SPEECH_SECONDS of the rep's own speech is left.
+ECHO_SUPPRESSION = True
+ECHO_FRAME_SECONDS = 0.02
+ECHO_REFERENCE_SECONDS = 10  # loopback history kept to compare mic chunks against
+ECHO_MAX_DELAY_SECONDS = 1.5  # loopback-to-mic delay searched, including the trailing silence listen() trims
+ECHO_CORRELATION_THRESHOLD = 0.6
+ECHO_REFERENCE_RMS = 300  # loopback frames quieter than this can't be echoing into the mic
+ECHO_MIN_SPEECH_SECONDS = 0.3
 
 
 class BaseRecorder:
-    def __init__(self, source, source_name):
+    noise_message = ""
+
+    def __init__(self, source, source_name, device_name):
         self.recorder = sr.Recognizer()
         self.recorder.energy_threshold = ENERGY_THRESHOLD
         self.recorder.dynamic_energy_threshold = DYNAMIC_ENERGY_THRESHOLD
+        if VOICE_ACTIVITY_DETECTION:
+            self.recorder.vad = sr.SpectralVAD()
         self.source = source
         self.source_name = source_name
+        self.device_name = device_name
+        self.dropped_chunks = 0
+        self.echo_suppressor = None
 
     def adjust_for_noise(self, device_name, msg):
         print(f"[INFO] Adjusting for ambient noise from {device_name}. " + msg)
         with self.source:
-            self.recorder.adjust_for_ambient_noise(self.source)
+            self.recorder.adjust_for_ambient_noise(self.source, duration=CALIBRATION_SECONDS)
         print(f"[INFO] Completed ambient noise adjustment for {device_name}.")
 
+    def calibrate(self, cache):
+        """
+        Sets the energy threshold for this device. Without a cached threshold this listens to ambient noise
+        first. With one, the cached threshold is used at once and refined from the first audio captured.
+        """
+        cached = cache.get(self.device_name)
+        if cached is not None:
+            self.recorder.energy_threshold = cached
+            self.source.taps.append(AmbientNoiseRefiner(self.recorder, self.source, cache, self.device_name))
+            return
+        self.adjust_for_noise(self.device_name, self.noise_message)
+        cache.set(self.device_name, self.recorder.energy_threshold)
+
     def record_into_queue(self, audio_queue):
         def record_callback(_, audio:sr.AudioData) -> None:
-            data = audio.get_raw_data()
-            audio_queue.put((self.source_name, data, datetime.utcnow()))
+            # A view of the recognizer's phrase buffer, which is reused once this returns.
+            data = audio.frame_data
+            if self.echo_suppressor is not None:
+                data = self.echo_suppressor.process(data, self.recorder.energy_threshold)
+                if data is None:
+                    return
+            # The only copy of the phrase, bytes() is a no-op if the echo suppressor already made one.
+            self.put_dropping_oldest(audio_queue, (self.source_name, bytes(data), datetime.utcnow()))
 
         self.recorder.listen_in_background(self.source, record_callback, phrase_time_limit=RECORD_TIMEOUT)
 
+    def get_stats(self):
+        stats = {"dropped_chunks": self.dropped_chunks, "vad_discarded_seconds": self.recorder.vad_discarded_seconds}
+        if self.echo_suppressor is not None:
+            stats.update(self.echo_suppressor.stats)
+        return stats
+
+    def put_dropping_oldest(self, audio_queue, item):
+        # Never block the capture thread: if the transcriber has fallen this far behind, shed the oldest chunk.
+        while True:
+            try:
+                audio_queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    audio_queue.get_nowait()
+                    self.dropped_chunks += 1
+                except queue.Empty:
+                    pass
+
+
+class AmbientNoiseRefiner:
+    """
+    Source tap that keeps adjusting a cached energy threshold from the first ``CALIBRATION_SECONDS`` of
+    non-speech capture, with the same moving average as ``Recognizer.adjust_for_ambient_noise``, and then
+    caches the result. Runs on the capture thread, so the call never waits for it.
+    """
+
+    def __init__(self, recognizer, source, cache, device_name):
+        self.recognizer = recognizer
+        self.source = source
+        self.cache = cache
+        self.device_name = device_name
+        self.cached = recognizer.energy_threshold
+        self.elapsed = 0.0
+        self.done = False
+
+    def __call__(self, buffer):
+        if self.done or len(buffer) == 0:
+            return
+        recognizer = self.recognizer
+        energy = pcm.rms(buffer, self.source.SAMPLE_WIDTH)
+        if energy > recognizer.energy_threshold:
+            return  # speech, or anything else listen() would record, isn't ambient noise
+        seconds = len(buffer) / (self.source.SAMPLE_WIDTH * self.source.channels * self.source.SAMPLE_RATE)
+        damping = recognizer.dynamic_energy_adjustment_damping ** seconds
+        target_energy = energy * recognizer.dynamic_energy_ratio
+        energy_threshold = recognizer.energy_threshold * damping + target_energy * (1 - damping)
+        recognizer.energy_threshold = min(max(energy_threshold, self.cached / MAX_REFINE_FACTOR),
+                                          self.cached * MAX_REFINE_FACTOR)
+        self.elapsed += seconds
+        if self.elapsed >= CALIBRATION_SECONDS:
+            self.done = True
+            self.cache.set(self.device_name, recognizer.energy_threshold)
+            print(f"[INFO] Refined the energy threshold for {self.device_name} to {recognizer.energy_threshold:.0f}.")
+
+
+def default_mic_info():
+    return sr.AudioHost.get().default_input_device_info()
+
+
+def default_loopback_info():
+    host = sr.AudioHost.get()
+    default_speakers = host.default_output_device_info(pyaudio.paWASAPI)
+    loopback = host.loopback_device_info(default_speakers)
+    if loopback is None:
+        print("[ERROR] No loopback device found.")
+        return default_speakers
+    return loopback
+
+
+def needs_calibration(cache):
+    """True if a default device has no cached threshold, so starting a call will listen to ambient noise first."""
+    return any(cache.get(info["name"]) is None for info in (default_mic_info(), default_loopback_info()))
+
+
+def calibrate_recorders(recorders, cache):
+    """Calibrates all ``recorders`` at once. Returns as soon as those without a cached threshold are done."""
+    threads = [threading.Thread(target=recorder.calibrate, args=(cache,), daemon=True) for recorder in recorders]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def frame_energies(data, frame_bytes):
+    # Mean square of the 16-bit samples in each frame, across all channels.
+    samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+    return (samples.reshape(-1, frame_bytes // 2) ** 2).mean(axis=1)
+
+
+class EchoSuppressor:
+    """
+    Detects loopback audio leaking into the mic by correlating each mic chunk's energy envelope with the
+    loopback's, over every delay up to ``ECHO_MAX_DELAY_SECONDS``. Envelopes survive the room far better than
+    the waveform, so no adaptive filter is needed.
+    """
+
+    def __init__(self, reference_source, source):
+        self.frame_bytes = int(source.SAMPLE_RATE * ECHO_FRAME_SECONDS) * source.SAMPLE_WIDTH * source.channels
+        self.reference_frame_bytes = (int(reference_source.SAMPLE_RATE * ECHO_FRAME_SECONDS)
+                                      * reference_source.SAMPLE_WIDTH * reference_source.channels)
+        capacity = int(ECHO_REFERENCE_SECONDS / ECHO_FRAME_SECONDS)
+        self.reference_energy = np.zeros(capacity, dtype=np.float32)
+        self.reference_time = np.full(capacity, -np.inf)
+        self.reference_frames = 0
+        self.pending = bytearray()
+        self.lock = threading.Lock()
+        self.stats = {"echo_chunks_dropped": 0, "echo_chunks_suppressed": 0}
+        reference_source.taps.append(self.push_reference)
+
+    def push_reference(self, buffer):
+        self.pending += buffer
+        if len(self.pending) < self.reference_frame_bytes:
+            return
+        usable = len(self.pending) - len(self.pending) % self.reference_frame_bytes
+        energies = frame_energies(bytes(self.pending[:usable]), self.reference_frame_bytes)
+        del self.pending[:usable]
+        # Each frame is stamped with the time it finished, so gaps while nothing plays stay gaps.
+        times = time.monotonic() - ECHO_FRAME_SECONDS * np.arange(len(energies) - 1, -1, -1)
+        with self.lock:
+            indices = (self.reference_frames + np.arange(len(energies))) % len(self.reference_energy)
+            self.reference_energy[indices] = energies
+            self.reference_time[indices] = times
+            self.reference_frames += len(energies)
+
+    def process(self, data, energy_threshold):
+        """Returns ``data`` with echo frames silenced, or None if nothing but echo is left."""
+        usable = len(data) - len(data) % self.frame_bytes
+        if usable == 0:
+            return data
+        mic = frame_energies(data[:usable], self.frame_bytes)
+        frame_count = len(mic)
+        max_delay = int(ECHO_MAX_DELAY_SECONDS / ECHO_FRAME_SECONDS)
+
+        # Lay the loopback envelope on a grid that ends now, so grid[j + k] lines up with mic frame k
+        # at a delay of max_delay - j frames.
+        grid_start = time.monotonic() - (frame_count + max_delay) * ECHO_FRAME_SECONDS
+        with self.lock:
+            in_window = self.reference_time >= grid_start
+            energies = self.reference_energy[in_window]
+            times = self.reference_time[in_window]
+        if not np.any(energies > ECHO_REFERENCE_RMS ** 2):
+            return data
+        grid = np.zeros(frame_count + max_delay, dtype=np.float32)
+        indices = np.clip(((times - grid_start) / ECHO_FRAME_SECONDS).astype(int), 0, len(grid) - 1)
+        np.maximum.at(grid, indices, energies)
+
+        windows = np.lib.stride_tricks.sliding_window_view(grid, frame_count)
+        mic_envelope = np.log1p(mic) - np.log1p(mic).mean()
+        reference_envelopes = np.log1p(windows)
+        reference_envelopes = reference_envelopes - reference_envelopes.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(reference_envelopes, axis=1) * np.linalg.norm(mic_envelope)
+        correlations = reference_envelopes @ mic_envelope / np.maximum(norms, 1e-9)
+        best = int(np.argmax(correlations))
+        if correlations[best] < ECHO_CORRELATION_THRESHOLD:
+            return data
+
+        echo_frames = windows[best] > ECHO_REFERENCE_RMS ** 2
+        speech_frames = (mic > energy_threshold ** 2) & ~echo_frames
+        if np.count_nonzero(speech_frames) * ECHO_FRAME_SECONDS < ECHO_MIN_SPEECH_SECONDS:
+            self.stats["echo_chunks_dropped"] += 1
+            return None
+        samples = np.frombuffer(data, dtype=np.int16).copy()
+        samples[:usable // 2].reshape(frame_count, -1)[echo_frames] = 0
+        self.stats["echo_chunks_suppressed"] += 1
+        return samples.tobytes()
+
+
 class DefaultMicRecorder(BaseRecorder):
+    noise_message = "Please make some noise from the Default Mic..."
+
     def __init__(self):
-        super().__init__(source=sr.Microphone(sample_rate=16000), source_name="You")
-        self.adjust_for_noise("Default Mic", "Please make some noise from the Default Mic...")
+        super().__init__(source=sr.Microphone(sample_rate=16000, latency_ms=CAPTURE_LATENCY_MS,
+                                                  ring_buffer_seconds=RING_BUFFER_SECONDS), source_name="You",
+                         device_name=default_mic_info()["name"])
+
+    def suppress_echo_from(self, speaker_recorder):
+        self.echo_suppressor = EchoSuppressor(speaker_recorder.source, self.source)
 
 class DefaultSpeakerRecorder(BaseRecorder):
+    noise_message = "Please make or play some noise from the Default Speaker..."
+
     def __init__(self):
-        with pyaudio.PyAudio() as p:
-            wasapi_info = p.get_host_api_info_by_type(pyaudio.paWASAPI)
-            default_speakers = p.get_device_info_by_index(wasapi_info["defaultOutputDevice"])
-            
-            if not default_speakers["isLoopbackDevice"]:
-                for loopback in p.get_loopback_device_info_generator():
-                    if default_speakers["name"] in loopback["name"]:
-                        default_speakers = loopback
-                        break
-                else:
-                    print("[ERROR] No loopback device found.")
-        
+        default_speakers = default_loopback_info()
         source = sr.Microphone(speaker=True,
                                device_index= default_speakers["index"],
                                sample_rate=int(default_speakers["defaultSampleRate"]),
-                               chunk_size=pyaudio.get_sample_size(pyaudio.paInt16),
-                               channels=default_speakers["maxInputChannels"])
-        super().__init__(source=source, source_name="Speaker")
-        self.adjust_for_noise("Default Speaker", "Please make or play some noise from the Default Speaker...")
+                               latency_ms=CAPTURE_LATENCY_MS,
+                               channels=default_speakers["maxInputChannels"],
+                               convert_rate=CAPTURE_SAMPLE_RATE,
+                               downmix=True,
+                               ring_buffer_seconds=RING_BUFFER_SECONDS)
+        super().__init__(source=source, source_name="Speaker", device_name=default_speakers["name"])
 
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from custom_speech_recognition import pcm
+
+SPOOL_DIR = 'spool'
+SPOOL_SAMPLE_WIDTH = 2  # audio is converted to 16-bit before µ-law encoding, which stores it in 1 byte per sample
+
+
+class AudioSpool:
+    """
+    Append-only store under ``SPOOL_DIR`` for audio that couldn't be transcribed while offline: µ-law audio in
+    one file and an ``index.jsonl`` line per segment and per recovery. A session that crashes leaves its spool
+    for the next one to find with ``leftover_spools``.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.path.join(SPOOL_DIR, datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+        os.makedirs(self.directory, exist_ok=True)
+        self.data_path = os.path.join(self.directory, "audio.ulaw")
+        self.index_path = os.path.join(self.directory, "index.jsonl")
+        self.lock = threading.Lock()
+        self.segments = {}
+        self.next_id = 0
+        self.load_index()
+
+    def load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path) as index:
+            for line in index:
+                entry = json.loads(line)
+                if entry.get("recovered"):
+                    self.segments.pop(entry["id"], None)
+                else:
+                    self.segments[entry["id"]] = entry
+                self.next_id = max(self.next_id, entry["id"] + 1)
+
+    def add(self, who_spoke, phrase_start, time_spoken, data, sample_rate, sample_width, channels, committed_text=""):
+        if sample_width != SPOOL_SAMPLE_WIDTH:
+            data = pcm.lin2lin(data, sample_width, SPOOL_SAMPLE_WIDTH)
+        encoded = pcm.lin2ulaw(data, SPOOL_SAMPLE_WIDTH)
+        with self.lock:
+            with open(self.data_path, "ab") as audio_file:
+                offset = audio_file.tell()
+                audio_file.write(encoded)
+            entry = {
+                "id": self.next_id,
+                "who_spoke": who_spoke,
+                "phrase_start": phrase_start.isoformat(),
+                "time_spoken": time_spoken.isoformat(),
+                "sample_rate": sample_rate,
+                "channels": channels,
+                "offset": offset,
+                "length": len(encoded),
+                "committed_text": committed_text,
+            }
+            self.next_id += 1
+            self.segments[entry["id"]] = entry
+            self.append_index(entry)
+        return entry
+
+    def read(self, entry):
+        """Returns the segment's audio as 16-bit PCM."""
+        with open(self.data_path, "rb") as audio_file:
+            audio_file.seek(entry["offset"])
+            encoded = audio_file.read(entry["length"])
+        return pcm.ulaw2lin(encoded, SPOOL_SAMPLE_WIDTH)
+
+    def mark_recovered(self, entry):
+        with self.lock:
+            self.segments.pop(entry["id"], None)
+            if self.segments:
+                self.append_index({"id": entry["id"], "recovered": True})
+            else:
+                # Everything is recovered, so the files start over instead of growing with every outage.
+                self.remove_files()
+
+    def pending(self):
+        with self.lock:
+            return sorted(self.segments.values(), key=lambda entry: entry["id"])
+
+    def remove_files(self):
+        for path in (self.data_path, self.index_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def remove(self):
+        """Deletes the spool, directory included. Only for a spool with nothing pending."""
+        with self.lock:
+            self.remove_files()
+            try:
+                os.rmdir(self.directory)
+            except OSError:
+                pass
+
+    def append_index(self, entry):
+        with open(self.index_path, "a") as index:
+            index.write(json.dumps(entry) + "\n")
+
+    def __len__(self):
+        return len(self.segments)
+
+
+def leftover_spools(spool_dir=SPOOL_DIR):
+    """Spools of earlier sessions that still hold audio, oldest first. Those with nothing left are deleted."""
+    if not os.path.isdir(spool_dir):
+        return []
+    spools = []
+    for name in sorted(os.listdir(spool_dir)):
+        directory = os.path.join(spool_dir, name)
+        if not os.path.isdir(directory):
+            continue
+        spool = AudioSpool(directory)
+        if len(spool):
+            spools.append(spool)
+        else:
+            spool.remove()
+    return spools
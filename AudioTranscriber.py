@@ -1,182 +1,810 @@
-import whisper
-import torch
+import numpy as np
 import wave
 import os
 import threading
-from tempfile import NamedTemporaryFile
-import custom_speech_recognition as sr
+import time
 import io
-from datetime import timedelta
-import pyaudiowpatch as pyaudio
-from heapq import merge
-from dotenv import load_dotenv
-import openai
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import string
+
+from custom_speech_recognition import dsp
+from custom_speech_recognition.exceptions import TranscriptionFailed
+from AudioSpool import AudioSpool, leftover_spools
+from Backends import load_backend
+from DraftRecognizer import DRAFT_SAMPLE_RATE
+from LocalWhisper import StreamingMelFrontend, WHISPER_SAMPLE_RATE
+from TranscriptStore import Segment, TranscriptStore
 
 PHRASE_TIMEOUT = 3.05
 USE_API = True
+LOCAL_MODEL = 'base.en'
+LOCAL_INFERENCE_PROCESS = True  # run local Whisper in a separate, warm process instead of the GUI process
+LOCAL_MEL_CACHE = True  # compute log-mel frames once per chunk and decode slices of the cache
+TRANSCRIPTION_WORKERS = 2  # speakers are transcribed concurrently, each in capture order
+
+# Streaming mode: once a phrase grows past STREAM_WINDOW_SECONDS, the text decoded so far is kept
+# and only the last STREAM_OVERLAP_SECONDS of audio are carried into the next window.
+STREAMING_TRANSCRIPTION = True
+STREAM_WINDOW_SECONDS = 10
+STREAM_OVERLAP_SECONDS = 1.5
+STITCH_MAX_OVERLAP_WORDS = 8
+MAX_UNFINALIZED_SECONDS = 20  # hard cap on audio held per speaker, in either mode
+
+# Backpressure: pending chunks for a speaker are always merged into one request. Once the oldest
+# pending chunk is more than MAX_LAG_SECONDS old, OVERLOAD_POLICY decides what happens next:
+#   "merge"       - keep everything and catch up with larger merged requests
+#   "drop_oldest" - discard pending audio older than MAX_LAG_SECONDS
+#   "degrade"     - transcribe with DEGRADED_LOCAL_MODEL until caught up (local mode only)
+OVERLOAD_POLICY = "merge"
+OVERLOAD_POLICIES = ("merge", "drop_oldest", "degrade")
+MAX_LAG_SECONDS = 10
+MAX_PENDING_SECONDS = 60  # hard cap on audio waiting for a worker per speaker, oldest is dropped first
+DEGRADED_LOCAL_MODEL = 'tiny.en'
+
+# Audio whose API request ran out of retries is put back at the front of its speaker's queue and
+# retried after REQUEUE_DELAY_SECONDS, up to MAX_REQUEUES times in a row.
+REQUEUE_DELAY_SECONDS = 5
+MAX_REQUEUES = 3
+
+# In API mode, requests move to a local Whisper model while the API is slow or failing (see AsrFailover).
+API_FAILOVER = True
+FAILOVER_LOCAL_MODEL = 'base.en'
+
+# When the API can't be reached at all, finished phrases are spooled to disk (see AudioSpool) instead of
+# retried. Every SPOOL_PROBE_SECONDS the API host is checked, and once it answers the spool is transcribed
+# with SPOOL_DRAIN_WORKERS concurrent requests and the text merged back in at its original position.
+OFFLINE_SPOOL = True
+SPOOL_PROBE_SECONDS = 5
+SPOOL_DRAIN_WORKERS = 8
+# Spools a crashed session left behind are transcribed at startup into a file of their own in this directory.
+RECOVERED_TRANSCRIPT_DIR = 'transcripts'
+
+# Backend per source and load level. None is the default backend (the API when USE_API is set), anything
+# else names a local Whisper model. A source's load goes "high" once its lag passes ROUTING_HIGH_LAG_SECONDS
+# and back to "normal" once it drops under ROUTING_NORMAL_LAG_SECONDS.
+SOURCE_ROUTES = {
+    "You": {"normal": None, "high": 'tiny.en'},
+    "Speaker": {"normal": None, "high": None},
+}
+DEFAULT_ROUTES = {"normal": None, "high": None}
+ROUTING_HIGH_LAG_SECONDS = 4
+ROUTING_NORMAL_LAG_SECONDS = 1
+
+# Two-tier transcripts: for DRAFT_SOURCES, a fast local recognizer (Vosk, see DraftRecognizer) shows draft
+# text as soon as a chunk arrives, and the draft line is replaced in place once the accurate text lands.
+DRAFT_TRANSCRIPTS = True
+DRAFT_SOURCES = ("Speaker",)
 
 
 class AudioTranscriber:
-    def __init__(self, mic_source, speaker_source):
-        self.transcript_data = {"You": [], "Speaker": []}
+    def __init__(self, mic_source, speaker_source, workers=TRANSCRIPTION_WORKERS, local_whisper=None):
+        check_overload_policy(OVERLOAD_POLICY, USE_API)
+        self.transcript_store = TranscriptStore()
         self.transcript_changed_event = threading.Event()
+        self.on_transcript = None  # called from worker threads after every transcript change
+        self.local_whisper = None
+        self.local_lock = threading.Lock()
+        self.local_loading = False
+        self.api_client = None
+        self.failover = None
         if USE_API:
+            # openai, its key and the failover router are only loaded when the API is in use.
+            from dotenv import load_dotenv
+            from AsrFailover import ApiFailover
             load_dotenv("keys.env")
-            openai.api_key = os.getenv("OPENAI_API_KEY")
-            self.audio_model = None
+            # The spool drain shares the client, so the pool has to hold a connection for each of its uploads too.
+            pool_size = max(workers * 2, SPOOL_DRAIN_WORKERS if OFFLINE_SPOOL else 0)
+            self.api_client = load_backend("asr", "api")(os.getenv("OPENAI_API_KEY"), pool_size=pool_size)
+            if API_FAILOVER:
+                self.failover = ApiFailover(self.api_client, self.get_local_whisper, FAILOVER_LOCAL_MODEL, workers)
             print("Whisper running on OpenAI API.")
         else:
-            self.audio_model = whisper.load_model('base.en')
-            print(f'Whisper running on device: {self.audio_model.device}')
+            self.local_whisper = local_whisper or self.load_local_whisper(LOCAL_MODEL)
         self.should_continue = True
-        self.audio_sources = {
-            "You": {
-                "sample_rate": mic_source.SAMPLE_RATE,
-                "sample_width": mic_source.SAMPLE_WIDTH,
-                "channels": mic_source.channels,
-                "last_sample": bytes(),
-                "last_spoken": None,
-                "new_phrase": True,
-                "process_data_func": self.process_mic_data
-            },
-            "Speaker": {
-                "sample_rate": speaker_source.SAMPLE_RATE,
-                "sample_width": speaker_source.SAMPLE_WIDTH,
-                "channels": speaker_source.channels,
-                "last_sample": bytes(),
-                "last_spoken": None,
-                "new_phrase": True,
-                "process_data_func": self.process_speaker_data
-            }
+        self.sources_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcriber")
+        self.audio_queue = None
+        self.offline = False
+        self.spool = None
+        self.spool_recovery = None
+        self.draft_recognizer = None
+        if DRAFT_TRANSCRIPTS:
+            try:
+                self.draft_recognizer = load_backend("draft_asr")()
+            except Exception as e:
+                print(f'[INFO] Draft transcripts disabled, Vosk is not available: {e}')
+        self.draft_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="draft")
+        self.stats = {"lag_seconds": 0.0, "merged_chunks": 0, "dropped_chunks": 0, "degraded_requests": 0,
+                      "requeued_chunks": 0, "spooled_segments": 0, "recovered_segments": 0, "routed_requests": {}}
+        self.stats_lock = threading.Lock()  # counters are updated from every worker thread
+        self.stats_sources = {}
+        self.audio_sources = {}
+        self.add_audio_source("You", mic_source)
+        self.add_audio_source("Speaker", speaker_source)
+        if USE_API and OFFLINE_SPOOL:
+            leftovers = leftover_spools()
+            if leftovers:
+                threading.Thread(target=self.recover_leftover_spools, args=(leftovers,), daemon=True).start()
+
+    @staticmethod
+    def warm_up():
+        """
+        Loads the selected ASR backend ahead of the transcriber, so it can happen while the devices are set
+        up. Returns the local Whisper backend to pass to the constructor, or None in API mode.
+        """
+        if USE_API:
+            load_backend("asr", "api")
+            return None
+        return AudioTranscriber.load_local_whisper(LOCAL_MODEL)
+
+    @staticmethod
+    def load_local_whisper(model_name):
+        if LOCAL_INFERENCE_PROCESS:
+            local_whisper = load_backend("asr", "local_process")(model_name)
+            print(f'Whisper running in inference process on device: {local_whisper.device}')
+        else:
+            local_whisper = load_backend("asr", "local")(model_name)
+            print(f'Whisper running on device: {local_whisper.device}')
+        return local_whisper
+
+    def get_local_whisper(self, model_name):
+        """Returns the local Whisper backend shared by routing and failover, loading it on first use."""
+        with self.local_lock:
+            if self.local_whisper is None:
+                self.local_whisper = self.load_local_whisper(model_name)
+            return self.local_whisper
+
+    def start_loading_local_whisper(self, model_name):
+        # local_lock is held for the whole load, so the flag is guarded by sources_lock to never block a worker.
+        with self.sources_lock:
+            if self.local_loading:
+                return
+            self.local_loading = True
+        print(f'[INFO] Loading local Whisper ({model_name}) for routed requests.')
+        threading.Thread(target=self.get_local_whisper, args=(model_name,), daemon=True).start()
+
+    def add_audio_source(self, who_spoke, source, routes=None):
+        source_info = {
+            "sample_rate": source.SAMPLE_RATE,
+            "sample_width": source.SAMPLE_WIDTH,
+            "channels": source.channels,
+            "last_sample": bytes(),
+            "committed_text": "",
+            "last_text": "",
+            "last_spoken": None,
+            "phrase_start": None,
+            "new_phrase": True,
+            "wav_buffer": named_bytes_io(f"{who_spoke}.wav"),
+            "mel_frontend": None if USE_API or not LOCAL_MEL_CACHE else StreamingMelFrontend(MAX_UNFINALIZED_SECONDS + 1),
+            "pending": deque(),
+            "pending_bytes": 0,
+            "busy": False,
+            "requeues": 0,
+            "retry_at": 0.0,
+            "routes": routes or SOURCE_ROUTES.get(who_spoke, DEFAULT_ROUTES),
+            "load": "normal",
+            "lag_seconds": 0.0,
+            "draft_phrase_start": None,
+            "draft_last_spoken": None,
+            "spooling": False
         }
+        # The mel cache and the draft recognizer are fed chunk by chunk, so each gets a resampler that carries
+        # its filter state from one chunk to the next.
+        source_info["mel_resampler"] = self.stream_resampler(source_info, WHISPER_SAMPLE_RATE)
+        source_info["draft_resampler"] = self.stream_resampler(source_info, DRAFT_SAMPLE_RATE)
+        self.audio_sources[who_spoke] = source_info
+
+    @staticmethod
+    def stream_resampler(source_info, target_rate):
+        if source_info["sample_rate"] == target_rate:
+            return None
+        return dsp.Resampler(source_info["sample_width"], 1, source_info["sample_rate"], target_rate)
 
     def transcribe_audio_queue(self, audio_queue):
+        self.audio_queue = audio_queue
         while self.should_continue:
             who_spoke, data, time_spoken = audio_queue.get()
+            self.submit_audio(who_spoke, data, time_spoken)
+        self.executor.shutdown(wait=False)
+        print('No longer transcribing audio.')
+
+    def submit_audio(self, who_spoke, data, time_spoken):
+        source_info = self.audio_sources[who_spoke]
+        if self.draft_recognizer is not None and who_spoke in DRAFT_SOURCES:
+            self.draft_executor.submit(self.transcribe_draft, who_spoke, data, time_spoken)
+        max_pending_bytes = self.seconds_to_bytes(source_info, MAX_PENDING_SECONDS)
+        with self.sources_lock:
+            pending = source_info["pending"]
+            pending.append((data, time_spoken))
+            source_info["pending_bytes"] += len(data)
+            while source_info["pending_bytes"] > max_pending_bytes and len(pending) > 1:
+                dropped_data, _ = pending.popleft()
+                source_info["pending_bytes"] -= len(dropped_data)
+                self.count("dropped_chunks")
+            if source_info["busy"]:
+                return
+            source_info["busy"] = True
+        self.executor.submit(self.drain_source, who_spoke)
+
+    def drain_source(self, who_spoke):
+        # Only one drain is scheduled per source at a time, so each speaker's chunks are transcribed and
+        # applied in capture order while different speakers run on different workers.
+        source_info = self.audio_sources[who_spoke]
+        with self.sources_lock:
+            chunks = list(source_info["pending"])
+            source_info["pending"].clear()
+            source_info["pending_bytes"] = 0
+        try:
+            self.transcribe_chunks(who_spoke, chunks)
+        except Exception as e:
+            print(f'[ERROR] Transcription failed for {who_spoke}.')
+            print(e)
+        with self.sources_lock:
+            if not source_info["pending"]:
+                source_info["busy"] = False
+                return
+        # Resubmit instead of looping so a chatty source can't starve the others when sources outnumber workers.
+        # The source stays busy while it waits out a requeue delay, so new chunks just accumulate behind it.
+        delay = source_info["retry_at"] - time.monotonic()
+        if delay > 0:
+            timer = threading.Timer(delay, self.executor.submit, args=(self.drain_source, who_spoke))
+            timer.daemon = True
+            timer.start()
+        else:
+            self.executor.submit(self.drain_source, who_spoke)
+
+    def transcribe_chunks(self, who_spoke, chunks):
+        source_info = self.audio_sources[who_spoke]
+        lag = (datetime.utcnow() - chunks[0][1]).total_seconds()
+        with self.stats_lock:
+            self.stats["lag_seconds"] = lag
+        self.update_load(who_spoke, lag)
+        degraded = False
+        if lag > MAX_LAG_SECONDS:
+            chunks, degraded = self.apply_overload_policy(chunks)
+
+        # Merge everything that belongs to the same phrase and window into a single request.
+        self.count("merged_chunks", len(chunks) - 1)
+        for i, (data, time_spoken) in enumerate(chunks):
+            # Audio buffered during an outage is spooled once its phrase or window is complete, even if the API
+            # has come back in the meantime, since nothing else would ever transcribe it.
+            if source_info["spooling"] and self.needs_flush_before(source_info, data, time_spoken):
+                self.spool_last_sample(who_spoke)
             self.update_last_sample_and_phrase_status(who_spoke, data, time_spoken)
-            source_info = self.audio_sources[who_spoke]
-            temp_file = source_info["process_data_func"](source_info["last_sample"])
-            text = self.get_transcription(temp_file)
+            if self.offline:
+                source_info["spooling"] = True
+                continue
+            if i == len(chunks) - 1 or self.needs_flush_before(source_info, *chunks[i + 1]):
+                try:
+                    self.transcribe_last_sample(who_spoke, time_spoken, degraded)
+                except Exception as e:
+                    # Any failure, a local decode error on a routed request included, only costs this request:
+                    # the rest of the backlog is put back and drained after it.
+                    if USE_API and OFFLINE_SPOOL and isinstance(e, TranscriptionFailed):
+                        from WhisperApiClient import is_connection_failure
+                        if is_connection_failure(e):
+                            self.go_offline(who_spoke, e)
+                            continue
+                    self.requeue(who_spoke, time_spoken, chunks[i + 1:], e)
+                    return
+                source_info["requeues"] = 0
 
-            if text != '' and text.lower() != 'you':
-                self.update_transcript(who_spoke, text, time_spoken)
-                self.transcript_changed_event.set()
-        print('No longer transcribing audio.')
+    def requeue(self, who_spoke, time_spoken, remaining_chunks, error):
+        source_info = self.audio_sources[who_spoke]
+        if source_info["requeues"] >= MAX_REQUEUES:
+            source_info["requeues"] = 0
+            retry_chunks = remaining_chunks
+            if USE_API and OFFLINE_SPOOL:
+                # The spool is retried once the API answers again, instead of holding up the speaker.
+                print(f'[WARN] Spooling audio from {who_spoke} after {MAX_REQUEUES} requeues: {error}')
+                self.spool_failed_audio(who_spoke)
+            else:
+                print(f'[ERROR] Giving up on audio from {who_spoke} after {MAX_REQUEUES} requeues: {error}')
+        else:
+            print(f'[WARN] Transcription failed for {who_spoke}, retrying in {REQUEUE_DELAY_SECONDS}s: {error}')
+            source_info["requeues"] += 1
+            # An empty chunk re-transcribes last_sample as it stands, which still holds the failed audio.
+            retry_chunks = [(b"", time_spoken)] + remaining_chunks
+            source_info["retry_at"] = time.monotonic() + REQUEUE_DELAY_SECONDS
+        with self.sources_lock:
+            source_info["pending"].extendleft(reversed(retry_chunks))
+            source_info["pending_bytes"] += sum(len(data) for data, _ in retry_chunks)
+        self.count("requeued_chunks", len(retry_chunks))
+
+    def transcribe_draft(self, who_spoke, data, time_spoken):
+        source_info = self.audio_sources[who_spoke]
+        last_spoken = source_info["draft_last_spoken"]
+        if last_spoken is not None and time_spoken - last_spoken > timedelta(seconds=PHRASE_TIMEOUT):
+            self.draft_recognizer.reset(who_spoke)
+            source_info["draft_phrase_start"] = None
+            source_info["draft_resampler"] = self.stream_resampler(source_info, DRAFT_SAMPLE_RATE)
+        if source_info["draft_phrase_start"] is None:
+            source_info["draft_phrase_start"] = time_spoken
+        source_info["draft_last_spoken"] = time_spoken
+
+        audio = self.get_audio_array(source_info, data, DRAFT_SAMPLE_RATE, source_info["draft_resampler"])
+        try:
+            text = self.draft_recognizer.accept(who_spoke, (audio * 32767).astype(np.int16).tobytes())
+        except Exception as e:
+            print(f'[ERROR] Draft transcription failed for {who_spoke}: {e}')
+            return
+        if not text:
+            return
+
+        # Once accurate text covers the start of this phrase, drafts would only duplicate it.
+        if self.transcript_store.add_draft(who_spoke, source_info["draft_phrase_start"], time_spoken, text):
+            self.notify_transcript_changed()
+
+    def notify_transcript_changed(self):
+        self.transcript_changed_event.set()
+        if self.on_transcript is not None:
+            self.on_transcript()
+
+    def update_load(self, who_spoke, lag):
+        source_info = self.audio_sources[who_spoke]
+        source_info["lag_seconds"] = lag
+        load = source_info["load"]
+        if load == "normal" and lag > ROUTING_HIGH_LAG_SECONDS:
+            load = "high"
+        elif load == "high" and lag < ROUTING_NORMAL_LAG_SECONDS:
+            load = "normal"
+        if load != source_info["load"]:
+            source_info["load"] = load
+            backend = source_info["routes"][load] or "default backend"
+            print(f'[INFO] {who_spoke} is {lag:.1f}s behind, load is {load}, routing to {backend}.')
+
+    def route(self, source_info):
+        model_name = source_info["routes"][source_info["load"]]
+        if model_name is not None and self.local_whisper is None:
+            # Keep using the default backend until the local model has loaded.
+            self.start_loading_local_whisper(model_name)
+            return None
+        return model_name
+
+    def go_offline(self, who_spoke, error):
+        # The audio whose request just failed is spooled right away, so it can't be lost if the API
+        # comes back before another chunk from this speaker arrives.
+        with self.sources_lock:
+            if self.spool is None:
+                self.spool = AudioSpool()
+        self.spool_last_sample(who_spoke)
+        with self.sources_lock:
+            if self.offline:
+                return
+            self.offline = True
+        print(f'[WARN] Whisper API unreachable, spooling audio to {self.spool.directory}: {error}')
+        self.start_spool_recovery()
+
+    def spool_failed_audio(self, who_spoke):
+        with self.sources_lock:
+            if self.spool is None:
+                self.spool = AudioSpool()
+        self.spool_last_sample(who_spoke)
+        self.start_spool_recovery()
+
+    def start_spool_recovery(self):
+        with self.sources_lock:
+            if self.spool_recovery is not None:
+                return
+            self.spool_recovery = threading.Thread(target=self.recover_spooled_audio, daemon=True)
+        self.spool_recovery.start()
+
+    def spool_last_sample(self, who_spoke):
+        source_info = self.audio_sources[who_spoke]
+        source_info["spooling"] = False
+        if not source_info["last_sample"]:
+            return
+        self.spool.add(who_spoke, source_info["phrase_start"], source_info["last_spoken"], source_info["last_sample"],
+                       source_info["sample_rate"], source_info["sample_width"], source_info["channels"],
+                       source_info["committed_text"])
+        # The spooled audio's text will replace whatever was decoded for it before the outage, and whatever
+        # follows is transcribed as a phrase of its own, so nothing is decoded twice.
+        self.reset_phrase(source_info)
+        source_info["new_phrase"] = True
+        self.count("spooled_segments")
+
+    def recover_spooled_audio(self):
+        from WhisperApiClient import api_reachable, is_connection_failure
+        while self.should_continue:
+            time.sleep(SPOOL_PROBE_SECONDS)
+            if not api_reachable():
+                continue
+            print(f'[INFO] Whisper API reachable again, transcribing {len(self.spool)} spooled segments.')
+            self.offline = False
+            connection_failed = False
+            # Phrases that were already in progress can still land in the spool while it drains.
+            while len(self.spool):
+                phrases, errors = self.drain_spool(self.spool)
+                for segments in phrases:
+                    self.merge_recovered_phrase(segments)
+                    for entry, _ in segments:
+                        self.spool.mark_recovered(entry)
+                self.count("recovered_segments", sum(len(segments) for segments in phrases))
+                if phrases:
+                    self.notify_transcript_changed()
+                if errors:
+                    connection_failed = any(is_connection_failure(e) for e in errors)
+                    break
+            with self.sources_lock:
+                # Only a lost connection takes the transcriber offline again. Audio the API failed on otherwise
+                # stays in the spool and is retried at the next probe.
+                if self.offline or connection_failed:
+                    self.offline = True
+                    continue
+                if len(self.spool):
+                    continue
+                self.spool_recovery = None
+                return
+
+    def recover_leftover_spools(self, spools):
+        # Their audio belongs to an earlier call, so its text goes to a transcript of its own, not this one.
+        from WhisperApiClient import api_reachable
+        for spool in spools:
+            print(f'[INFO] Transcribing {len(spool)} segments spooled by an earlier session in {spool.directory}.')
+            while self.should_continue and len(spool):
+                if not api_reachable():
+                    time.sleep(SPOOL_PROBE_SECONDS)
+                    continue
+                phrases, errors = self.drain_spool(spool)
+                if phrases:
+                    self.save_recovered_transcript(spool, phrases)
+                if errors:
+                    time.sleep(SPOOL_PROBE_SECONDS)
+            if not len(spool):
+                spool.remove()
+
+    def save_recovered_transcript(self, spool, phrases):
+        segments = sorted((Segment(*self.recovered_phrase(phrase)) for phrase in phrases), key=lambda s: s.time)
+        segments = [segment for segment in segments if segment.text]
+        path = os.path.join(RECOVERED_TRANSCRIPT_DIR, f'recovered_{os.path.basename(spool.directory)}.txt')
+        if segments:
+            os.makedirs(RECOVERED_TRANSCRIPT_DIR, exist_ok=True)
+            with open(path, 'a') as f:
+                f.write(self.format_transcript(segments, speakername="Speaker") + "\n\n")
+        # Only marked once the text is on disk, so a crash in between transcribes the audio again.
+        for phrase in phrases:
+            for entry, _ in phrase:
+                spool.mark_recovered(entry)
+        self.count("recovered_segments", sum(len(phrase) for phrase in phrases))
+        print(f'[INFO] Saved text recovered from {spool.directory} to {path}.')
+
+    def drain_spool(self, spool):
+        """
+        Transcribes everything pending in ``spool``. Returns the phrases transcribed, each a list of
+        ``(entry, text)`` in spool order, and the errors of the requests that failed.
+        """
+        entries = spool.pending()
+        with ThreadPoolExecutor(max_workers=SPOOL_DRAIN_WORKERS, thread_name_prefix="spool") as pool:
+            results = list(pool.map(lambda entry: self.transcribe_spooled(spool, entry), entries))
+
+        phrases = {}
+        errors = []
+        for entry, (text, error) in zip(entries, results):
+            if error is None:
+                phrases.setdefault((entry["who_spoke"], entry["phrase_start"]), []).append((entry, text))
+            else:
+                errors.append(error)
+        return list(phrases.values()), errors
+
+    def transcribe_spooled(self, spool, entry):
+        spooled_format = {"sample_rate": entry["sample_rate"], "sample_width": 2, "channels": entry["channels"]}
+        audio = self.get_wav_buffer(spooled_format, spool.read(entry), named_bytes_io("spooled.wav"))
+        try:
+            return self.get_transcription(audio), None
+        except TranscriptionFailed as e:
+            print(f'[WARN] Could not transcribe spooled audio from {entry["who_spoke"]}: {e}')
+            return None, e
+
+    @staticmethod
+    def recovered_phrase(segments):
+        """Joins a spooled phrase's ``(entry, text)`` segments into ``(who_spoke, phrase_start, time_spoken, text)``."""
+        text = segments[0][0]["committed_text"]
+        for _, segment_text in segments:
+            if segment_text.lower() != 'you':
+                text = stitch_transcripts(text, segment_text)
+        return (segments[0][0]["who_spoke"], datetime.fromisoformat(segments[0][0]["phrase_start"]),
+                datetime.fromisoformat(segments[-1][0]["time_spoken"]), text)
+
+    def merge_recovered_phrase(self, segments):
+        who_spoke, phrase_start, time_spoken, text = self.recovered_phrase(segments)
+        if not text:
+            return
+        # A phrase has at most one line, so a line that was decoded for this phrase before the outage
+        # sits between its start and the last spooled segment.
+        self.transcript_store.merge_final(who_spoke, phrase_start, time_spoken, text)
+
+    def apply_overload_policy(self, chunks):
+        chunks, dropped, degraded = overload_chunks(chunks, OVERLOAD_POLICY, datetime.utcnow())
+        self.count("dropped_chunks", dropped)
+        if degraded:
+            self.count("degraded_requests")
+        return chunks, degraded
+
+    def needs_flush_before(self, source_info, data, time_spoken):
+        # The buffered audio has to be transcribed before the next chunk starts a new phrase or pushes
+        # the streaming window forward, otherwise its text would never be decoded.
+        if self.starts_new_phrase(source_info, time_spoken):
+            return True
+        window_bytes = self.seconds_to_bytes(source_info, STREAM_WINDOW_SECONDS)
+        return STREAMING_TRANSCRIPTION and len(source_info["last_sample"]) + len(data) > window_bytes
+
+    def transcribe_last_sample(self, who_spoke, time_spoken, degraded=False):
+        source_info = self.audio_sources[who_spoke]
+        data = source_info["last_sample"]
+        model_name = self.route(source_info)
+        if model_name is None:
+            audio = self.process_data(who_spoke, data)
+            text = self.get_transcription(audio, degraded, local_audio=lambda: self.get_local_input(source_info, data))
+        else:
+            text = self.local_whisper.transcribe(self.get_local_input(source_info, data), model_name)
+        with self.stats_lock:
+            routed_requests = self.stats["routed_requests"]
+            routed_requests[model_name or "default"] = routed_requests.get(model_name or "default", 0) + 1
+
+        if text != '' and text.lower() != 'you':
+            source_info["last_text"] = text
+            text = stitch_transcripts(source_info["committed_text"], text)
+            self.update_transcript(who_spoke, text, time_spoken)
+            self.notify_transcript_changed()
+
+    def count(self, name, amount=1):
+        with self.stats_lock:
+            self.stats[name] += amount
+
+    def add_stats_source(self, name, get_stats):
+        """Includes ``get_stats()`` in ``get_stats`` under ``name``, e.g. a recorder's dropped chunks."""
+        self.stats_sources[name] = get_stats
+
+    def get_stats(self):
+        with self.sources_lock:
+            pending = {who: len(info["pending"]) for who, info in self.audio_sources.items()}
+        with self.stats_lock:
+            stats = dict(self.stats)
+            stats["routed_requests"] = dict(self.stats["routed_requests"])
+        stats["pending_chunks"] = pending
+        stats["queue_depth"] = sum(pending.values()) + (self.audio_queue.qsize() if self.audio_queue else 0)
+        if self.local_whisper is not None:
+            stats["local_real_time_factor"] = self.local_whisper.real_time_factor()
+        if self.api_client is not None:
+            stats["api"] = self.api_client.get_stats()
+        if self.failover is not None:
+            stats["failover"] = self.failover.get_stats()
+        for name, get_stats in self.stats_sources.items():
+            stats[name] = get_stats()
+        return stats
+
+    @staticmethod
+    def starts_new_phrase(source_info, time_spoken):
+        last_spoken = source_info["last_spoken"]
+        return last_spoken is not None and time_spoken - last_spoken > timedelta(seconds=PHRASE_TIMEOUT)
 
     def update_last_sample_and_phrase_status(self, who_spoke, data, time_spoken):
         source_info = self.audio_sources[who_spoke]
-        if source_info["last_spoken"] and time_spoken - source_info["last_spoken"] > timedelta(seconds=PHRASE_TIMEOUT):
-            source_info["last_sample"] = bytes()
+        if self.starts_new_phrase(source_info, time_spoken):
+            # new_phrase stays set until a transcript line has actually been added for the phrase.
+            self.reset_phrase(source_info)
             source_info["new_phrase"] = True
-        else:
-            source_info["new_phrase"] = False
+        if source_info["phrase_start"] is None:
+            source_info["phrase_start"] = time_spoken
+
+        window_bytes = self.seconds_to_bytes(source_info, STREAM_WINDOW_SECONDS)
+        if STREAMING_TRANSCRIPTION and len(source_info["last_sample"]) + len(data) > window_bytes:
+            self.commit_stream_window(source_info)
+
+        max_bytes = self.seconds_to_bytes(source_info, MAX_UNFINALIZED_SECONDS)
+        if len(source_info["last_sample"]) + len(data) > max_bytes:
+            # Audio is about to be dropped from the start of the phrase, so keep the text decoded from it,
+            # otherwise the next request would overwrite the line and its words would be gone.
+            self.commit_stream_window(source_info)
 
         source_info["last_sample"] += data
-        source_info["last_spoken"] = time_spoken 
-
-    def process_mic_data(self, data):
-        temp_file = NamedTemporaryFile().name
-        audio_data = sr.AudioData(data, self.audio_sources["You"]["sample_rate"], self.audio_sources["You"]["sample_width"])
-        wav_data = io.BytesIO(audio_data.get_wav_data())
-        with open(temp_file, 'w+b') as f:
-            f.write(wav_data.read())
-        return temp_file
-
-    def process_speaker_data(self, data):
-        temp_file = NamedTemporaryFile().name
-        with wave.open(temp_file, 'wb') as wf:
-            wf.setnchannels(self.audio_sources["Speaker"]["channels"])
-            p = pyaudio.PyAudio()
-            wf.setsampwidth(p.get_sample_size(pyaudio.paInt16))
-            wf.setframerate(self.audio_sources["Speaker"]["sample_rate"])
+        if source_info["mel_frontend"] is not None:
+            source_info["mel_frontend"].push(self.get_audio_array(source_info, data, resampler=source_info["mel_resampler"]))
+        if len(source_info["last_sample"]) > max_bytes:
+            source_info["last_sample"] = source_info["last_sample"][-max_bytes:]
+        source_info["last_spoken"] = time_spoken
+
+    def commit_stream_window(self, source_info):
+        # Keep the text decoded for the current window and only carry the overlap tail forward,
+        # so the next request covers the new audio plus enough context to stitch on.
+        source_info["committed_text"] = stitch_transcripts(source_info["committed_text"], source_info["last_text"])
+        source_info["last_text"] = ""
+        overlap_bytes = self.seconds_to_bytes(source_info, STREAM_OVERLAP_SECONDS)
+        source_info["last_sample"] = source_info["last_sample"][-overlap_bytes:] if overlap_bytes else bytes()
+
+    @staticmethod
+    def reset_phrase(source_info):
+        if source_info["mel_frontend"] is not None:
+            source_info["mel_frontend"].reset()
+            source_info["mel_resampler"] = AudioTranscriber.stream_resampler(source_info, WHISPER_SAMPLE_RATE)
+        source_info["last_sample"] = bytes()
+        source_info["committed_text"] = ""
+        source_info["last_text"] = ""
+        source_info["phrase_start"] = None
+
+    @staticmethod
+    def seconds_to_bytes(source_info, seconds):
+        frame_size = source_info["sample_width"] * source_info["channels"]
+        return int(seconds * source_info["sample_rate"]) * frame_size
+
+    def process_data(self, who_spoke, data, wav_buffer=None):
+        source_info = self.audio_sources[who_spoke]
+        if USE_API:
+            return self.get_wav_buffer(source_info, data, wav_buffer)
+        return self.get_local_input(source_info, data)
+
+    @staticmethod
+    def get_local_input(source_info, data):
+        if source_info["mel_frontend"] is not None:
+            # The cache already holds frames for everything in last_sample, so just slice them out.
+            seconds = len(data) / (source_info["sample_rate"] * source_info["sample_width"] * source_info["channels"])
+            return source_info["mel_frontend"].latest(seconds)
+        return AudioTranscriber.get_audio_array(source_info, data)
+
+    @staticmethod
+    def get_wav_buffer(source_info, data, wav_buffer=None):
+        # The per-source buffer is rewound and rewritten for every request, so nothing touches the disk.
+        # Callers that keep several requests for a source in flight pass their own buffer instead.
+        if wav_buffer is None:
+            wav_buffer = source_info["wav_buffer"]
+        wav_buffer.seek(0)
+        wav_buffer.truncate()
+        with wave.open(wav_buffer, 'wb') as wf:
+            wf.setnchannels(source_info["channels"])
+            wf.setsampwidth(source_info["sample_width"])
+            wf.setframerate(source_info["sample_rate"])
             wf.writeframes(data)
-        return temp_file
+        wav_buffer.seek(0)
+        return wav_buffer
 
-    def get_transcription(self, file_path):
+    @staticmethod
+    def get_audio_array(source_info, data, target_rate=WHISPER_SAMPLE_RATE, resampler=None):
+        # Local Whisper takes float32 mono audio at 16 kHz directly, so skip the WAV container entirely.
+        # Streams pass their source's resampler, data resampled on its own gets a fresh one.
+        sample_width = source_info["sample_width"]
+        if source_info["channels"] > 1:
+            data = dsp.downmix(data, sample_width, source_info["channels"])
+        if source_info["sample_rate"] != target_rate:
+            if resampler is None:
+                resampler = AudioTranscriber.stream_resampler(source_info, target_rate)
+            data = resampler.process(data)
+        return np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def get_transcription(self, audio, degraded=False, local_audio=None):
         if USE_API:
+            import openai
             try:
-                os.rename(file_path, f'{file_path}.wav')
-                audio_file = open(f'{file_path}.wav', "rb")
-                result = openai.Audio.transcribe('whisper-1', file= audio_file, language="en")
+                if self.failover is not None and local_audio is not None:
+                    return self.failover.transcribe(audio, local_audio)
+                return self.api_client.transcribe(audio)
+            except TranscriptionFailed:
+                raise
             except openai.error.AuthenticationError:
                 print('Authentication error - invalid or expired API key.')
                 return ''
             except openai.error.InvalidRequestError:
                 print('Invalid request. Request was malformed or missing parameters.')
                 return ''
-            except openai.error.APIConnectionError:
-                print('API connection error. Check network settings, config.')
-                return ''
             except openai.error.APIError:
-                print('API error. Probably OpenAI at fault.')
-                return ''
-            except openai.error.Timeout:
-                print('API timeout error.')
+                print('API error. Request rejected by the API.')
                 return ''
             except openai.error.PermissionError:
                 print('Permission error. Check API key permissions.')
                 return ''
-            except openai.error.RateLimitError:
-                print('Rate limit error. Check rate limits on your OpenAI account.')
-                return ''
             except Exception as e:
                 print('Unknown error.')
                 print(e)
                 return ''
-
-        else:
-            result = self.audio_model.transcribe(file_path, fp16=torch.cuda.is_available())
-        return result['text'].strip()
+        return self.local_whisper.transcribe(audio, DEGRADED_LOCAL_MODEL if degraded else LOCAL_MODEL)
 
     def update_transcript(self, who_spoke, text, time_spoken):
         source_info = self.audio_sources[who_spoke]
-        transcript = self.transcript_data[who_spoke]
+        # Drafts for phrases that started by time_spoken are now covered by accurate text, which takes
+        # their place. Drafts of later phrases stay after it.
+        self.transcript_store.add_final(who_spoke, source_info["phrase_start"] or time_spoken, time_spoken, text,
+                                        source_info["new_phrase"])
+        source_info["new_phrase"] = False
 
-        if source_info["new_phrase"] or len(transcript) == 0:
-            transcript.insert(0, (f"{who_spoke}: [{text}]\n\n", time_spoken))
-        else:
-            transcript[0] = (f"{who_spoke}: [{text}]\n\n", time_spoken)
+    def get_transcript_list(self, username="You", speakername="Speaker", max_phrases=30, include_drafts=False):
+        _, segments = self.transcript_store.snapshot()
+        return self.recent_segments(segments, max_phrases, include_drafts)
 
-    def get_transcript_list(self, username="You", speakername="Speaker", max_phrases=30):
-        combined_transcript = list(merge(
-            self.transcript_data["You"], self.transcript_data["Speaker"], 
-            key=lambda x: x[1], reverse=True))
-        combined_transcript = combined_transcript[:max_phrases]
-        combined_transcript = combined_transcript[::-1]
-        return combined_transcript
+    @staticmethod
+    def recent_segments(segments, max_phrases, include_drafts):
+        if include_drafts:
+            return list(segments[-max_phrases:])
+        recent = []
+        for segment in reversed(segments):
+            if segment.final:
+                recent.append(segment)
+                if len(recent) == max_phrases:
+                    break
+        return recent[::-1]
 
     def format_transcript(self, transcript, username="You", speakername="speaker"):
-        formatted = "\n\n".join(
-            [f'{username if t[0].startswith("You") else speakername}: "{t[0][t[0].index(":") + 2:-3]}" ' for t in
-             transcript])
-        formatted = formatted.replace("[", "")
-        return formatted
+        # Draft lines end in an ellipsis until their accurate text arrives.
+        return "\n\n".join(
+            [f'{username if segment.speaker == "You" else speakername}: "{segment.text}'
+             f'{"" if segment.final else "..."}" ' for segment in transcript])
 
-    def get_transcript(self, username="You", speakername="Speaker", max_phrases=30):
-        transcript_list = self.get_transcript_list(username, speakername, max_phrases)
-        formatted_transcript = self.format_transcript(transcript_list, username, speakername)
-        return formatted_transcript
+    def get_transcript(self, username="You", speakername="Speaker", max_phrases=30, include_drafts=False):
+        # Called every few seconds by the GUI and for every chat message, so unchanged transcripts are
+        # served from the store's memoized views. Drafts are unconfirmed, so only the live view shows them,
+        # never the text given to the LLM or saved.
+        return self.transcript_store.view(
+            ("transcript", username, speakername, max_phrases, include_drafts),
+            lambda segments: self.format_transcript(self.recent_segments(segments, max_phrases, include_drafts),
+                                                    username, speakername))
 
     def get_speaker_transcript(self):
-        transcript = list(merge(self.transcript_data["Speaker"], key=lambda x: x[1], reverse=True))
-        text_only = []
-        for item in transcript:
-            text = item[0]
-            extracted_text = text.split("[")[1].split("]")[0]
-            text_only.append(extracted_text)
-        text_string = " ".join(text_only)
-        return text_string
-    
-    def clear_transcript_data(self):
-        self.transcript_data["You"].clear()
-        self.transcript_data["Speaker"].clear()
+        return self.transcript_store.view(
+            ("speaker",),
+            lambda segments: " ".join(s.text for s in reversed(segments) if s.speaker == "Speaker" and s.final))
 
-        self.audio_sources["You"]["last_sample"] = bytes()
-        self.audio_sources["Speaker"]["last_sample"] = bytes()
+    def clear_transcript_data(self):
+        self.transcript_store.clear()
 
-        self.audio_sources["You"]["new_phrase"] = True
-        self.audio_sources["Speaker"]["new_phrase"] = True
+        for who_spoke, source_info in self.audio_sources.items():
+            self.reset_phrase(source_info)
+            source_info["new_phrase"] = True
+            source_info["draft_phrase_start"] = None
+            source_info["draft_last_spoken"] = None
+            if self.draft_recognizer is not None:
+                self.draft_recognizer.reset(who_spoke)
 
 
     def stop(self):
-        self.should_continue = False
\ No newline at end of file
+        self.should_continue = False
+        if self.local_whisper is not None:
+            self.local_whisper.close()
+        if self.failover is not None:
+            self.failover.close()
+
+
+def check_overload_policy(policy, use_api):
+    if policy not in OVERLOAD_POLICIES:
+        raise ValueError(f'Unknown OVERLOAD_POLICY "{policy}", expected one of {", ".join(OVERLOAD_POLICIES)}')
+    if policy == "degrade" and use_api:
+        raise ValueError('OVERLOAD_POLICY "degrade" switches to a smaller local model, it needs USE_API = False')
+
+
+def overload_chunks(chunks, policy, now):
+    """
+    Applies ``policy`` to lagging ``chunks``. Returns the chunks to transcribe, how many were dropped, and
+    whether to transcribe them with DEGRADED_LOCAL_MODEL.
+    """
+    if policy == "drop_oldest":
+        cutoff = now - timedelta(seconds=MAX_LAG_SECONDS)
+        fresh_chunks = [chunk for chunk in chunks if chunk[1] >= cutoff] or chunks[-1:]
+        return fresh_chunks, len(chunks) - len(fresh_chunks), False
+    return chunks, 0, policy == "degrade"
+
+
+def named_bytes_io(name):
+    # The OpenAI client uses the file name to tell the upload's format.
+    buffer = io.BytesIO()
+    buffer.name = name
+    return buffer
+
+
+def normalize_word(word):
+    return word.lower().strip(string.punctuation)
+
+
+def stitch_transcripts(committed, text, max_overlap_words=STITCH_MAX_OVERLAP_WORDS):
+    """Joins ``text`` onto ``committed``, dropping the words the overlapping audio decoded twice."""
+    if not committed:
+        return text
+    if not text:
+        return committed
+    committed_words = committed.split()
+    new_words = text.split()
+    committed_tail = [normalize_word(w) for w in committed_words[-max_overlap_words:]]
+    new_head = [normalize_word(w) for w in new_words[:max_overlap_words]]
+    for overlap in range(min(len(committed_tail), len(new_head)), 0, -1):
+        if committed_tail[-overlap:] == new_head[:overlap]:
+            new_words = new_words[overlap:]
+            break
+    return " ".join(committed_words + new_words)
@@ -0,0 +1,63 @@
+"""
+Registry of the heavy, swappable backends, each named by a ``"module:attribute"`` string and only imported
+the first time it's asked for.
+"""
+import importlib
+import threading
+
+# kind -> backend name -> "module:attribute", or just "module" for a whole module
+BACKENDS = {
+    "asr": {
+        "api": "WhisperApiClient:WhisperApiClient",
+        "local": "LocalWhisper:LocalWhisperModel",
+        "local_process": "LocalWhisper:WhisperProcessClient",
+    },
+    "draft_asr": {
+        "vosk": "DraftRecognizer:VoskDraftRecognizer",
+    },
+    "llm": {
+        "openai": "langchain.chat_models:ChatOpenAI",
+    },
+    "llm_messages": {
+        "openai": "langchain.schema",
+    },
+    "embeddings": {
+        "openai": "langchain.embeddings:OpenAIEmbeddings",
+    },
+    "vector_store": {
+        "deeplake": "langchain.vectorstores:DeepLake",
+    },
+}
+# The backend load_backend returns when no name is given. The ASR choice is made by USE_API and
+# LOCAL_INFERENCE_PROCESS in AudioTranscriber.
+SELECTED_BACKENDS = {
+    "draft_asr": "vosk",
+    "llm": "openai",
+    "llm_messages": "openai",
+    "embeddings": "openai",
+    "vector_store": "deeplake",
+}
+
+_loaded = {}
+_lock = threading.Lock()
+
+
+def load_backend(kind, name=None):
+    """
+    Returns the class (or module) registered for backend ``name`` of ``kind``, importing it on first use.
+    Raises KeyError for an unknown backend and ImportError when its package isn't installed.
+    """
+    name = name or SELECTED_BACKENDS[kind]
+    key = (kind, name)
+    with _lock:
+        if key not in _loaded:
+            module_name, _, attribute = BACKENDS[kind][name].partition(":")
+            module = importlib.import_module(module_name)
+            _loaded[key] = getattr(module, attribute) if attribute else module
+        return _loaded[key]
+
+
+def loaded_backends():
+    """The (kind, name) pairs imported so far."""
+    with _lock:
+        return list(_loaded)
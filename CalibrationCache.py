@@ -0,0 +1,37 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+CALIBRATION_CACHE_PATH = 'calibration.json'
+
+
+class CalibrationCache:
+    """
+    Energy thresholds per device name in ``CALIBRATION_CACHE_PATH``, so later calls can start capturing at once.
+    The file is swapped in whole with ``os.replace`` on every update.
+    """
+
+    def __init__(self, path=CALIBRATION_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            try:
+                with open(path) as cache_file:
+                    self.entries = json.load(cache_file)
+            except (OSError, ValueError) as e:
+                print(f'[WARN] Ignoring unreadable calibration cache {path}: {e}')
+
+    def get(self, device_name):
+        entry = self.entries.get(device_name)
+        return None if entry is None else entry["energy_threshold"]
+
+    def set(self, device_name, energy_threshold):
+        with self.lock:
+            self.entries[device_name] = {"energy_threshold": energy_threshold,
+                                         "calibrated": datetime.now().isoformat(timespec="seconds")}
+            temporary_path = self.path + ".tmp"
+            with open(temporary_path, "w") as cache_file:
+                json.dump(self.entries, cache_file, indent=2)
+            os.replace(temporary_path, self.path)
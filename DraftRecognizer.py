@@ -0,0 +1,38 @@
+import json
+
+DRAFT_MODEL_PATH = "model"  # unpacked Vosk model, the same location Recognizer.recognize_vosk uses
+DRAFT_SAMPLE_RATE = 16000
+
+
+class VoskDraftRecognizer:
+    """
+    Streaming Vosk recognizer giving provisional text for the current phrase long before Whisper answers.
+    Takes 16 kHz mono 16-bit PCM, one stream per speaker, which ``reset`` drops at the end of a phrase.
+    """
+
+    def __init__(self, model_path=DRAFT_MODEL_PATH):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+        self.streams = {}
+
+    def reset(self, who_spoke):
+        self.streams.pop(who_spoke, None)
+
+    def accept(self, who_spoke, pcm):
+        """Feeds ``pcm`` into ``who_spoke``'s stream and returns the phrase's text so far."""
+        from vosk import KaldiRecognizer
+        stream = self.streams.get(who_spoke)
+        if stream is None:
+            stream = self.streams[who_spoke] = {"recognizer": KaldiRecognizer(self.model, DRAFT_SAMPLE_RATE),
+                                                "text": ""}
+        recognizer = stream["recognizer"]
+        # Vosk finalises an utterance on its own when it hears a pause, after that only the new partial is pending.
+        if recognizer.AcceptWaveform(pcm):
+            stream["text"] = join_text(stream["text"], json.loads(recognizer.Result())["text"])
+            return stream["text"]
+        return join_text(stream["text"], json.loads(recognizer.PartialResult())["partial"])
+
+
+def join_text(first, second):
+    return f"{first} {second}".strip()
@@ -0,0 +1,408 @@
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturesTimeout
+
+import numpy as np
+
+from custom_speech_recognition.exceptions import TranscriptionFailed
+
+WHISPER_SAMPLE_RATE = 16000
+N_FFT = 400
+HOP_LENGTH = 160
+N_MELS = 80
+N_FRAMES = 3000  # 30 seconds of mel frames, Whisper's fixed context
+FRAMES_PER_SECOND = WHISPER_SAMPLE_RATE // HOP_LENGTH
+WARMUP_SECONDS = 1
+MAX_BATCH_SIZE = 8
+BATCH_WINDOW_SECONDS = 0.02  # how long the worker waits for more segments before running a batch
+# A request to the inference process fails after INFERENCE_TIMEOUT_SECONDS, and the process is restarted.
+# Loading another model in the process counts against it, so it has room for that.
+INFERENCE_TIMEOUT_SECONDS = 120
+PROCESS_POLL_SECONDS = 0.5  # how often a wait on the inference process checks that it's still alive
+
+# CPU mode (no CUDA): Linear layers are dynamically quantized to int8 and torch uses CPU_THREADS threads.
+QUANTIZE_ON_CPU = True
+CPU_THREADS = max(1, (os.cpu_count() or 2) // 2)
+
+# "live" is greedy with no temperature fallback, for the lowest latency during a call.
+# "post_call" uses beam search and falls back to sampling when a decode looks degenerate.
+DECODE_PROFILES = {
+    "live": {"beam_size": None, "best_of": None, "temperature": (0.0,)},
+    "post_call": {"beam_size": 5, "best_of": 5, "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)},
+}
+DECODE_PROFILE = "live"
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+NO_SPEECH_THRESHOLD = 0.6
+
+
+def load_model(model_name):
+    """
+    Loads a Whisper model. Without CUDA the model is tuned for CPU inference: int8 dynamic
+    quantization of the Linear layers and a fixed torch thread count.
+    """
+    import torch
+    import whisper
+
+    if torch.cuda.is_available():
+        return whisper.load_model(model_name)
+
+    torch.set_num_threads(CPU_THREADS)
+    model = whisper.load_model(model_name, device="cpu")
+    if QUANTIZE_ON_CPU:
+        # Whisper uses its own Linear subclass, which quantize_dynamic would skip; it only differs from
+        # nn.Linear by casting weights for fp16, which never happens on CPU.
+        for module in model.modules():
+            if isinstance(module, whisper.model.Linear):
+                module.__class__ = torch.nn.Linear
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def decoding_options(profile, temperature):
+    import torch
+    import whisper
+
+    options = {"language": "en", "without_timestamps": True, "fp16": torch.cuda.is_available(),
+               "temperature": temperature}
+    if temperature > 0:
+        options["best_of"] = profile["best_of"]
+    else:
+        options["beam_size"] = profile["beam_size"]
+    return whisper.DecodingOptions(**options)
+
+
+def needs_fallback(result):
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+        return False  # silence, a retry would not help
+    return result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD
+
+
+def segment_seconds(segment):
+    """Duration of a segment given either as 1-D audio or as 2-D mel frames."""
+    if segment.ndim == 1:
+        return len(segment) / WHISPER_SAMPLE_RATE
+    return segment.shape[1] / FRAMES_PER_SECOND
+
+
+def segment_to_mel(segment):
+    """
+    Returns the (N_MELS, N_FRAMES) model input for ``segment``: either float32 16 kHz mono audio, or
+    normalised mel frames from ``StreamingMelFrontend``, which are padded here without any FFT work.
+    """
+    import torch
+    import whisper
+
+    if segment.ndim == 1:
+        return whisper.log_mel_spectrogram(whisper.pad_or_trim(torch.from_numpy(segment)))
+    mel = segment[:, -N_FRAMES:]
+    if mel.shape[1] < N_FRAMES:
+        # Whisper's zero padding ends up at the clamp floor, which is 2.0 below the normalised maximum.
+        padding = np.full((N_MELS, N_FRAMES - mel.shape[1]), mel.max() - 2.0, dtype=np.float32)
+        mel = np.concatenate([mel, padding], axis=1)
+    return torch.from_numpy(np.ascontiguousarray(mel, dtype=np.float32))
+
+
+def decode_batch(model, segments, profile_name=DECODE_PROFILE):
+    """
+    Decodes a batch of segments in one padded forward pass, retrying those that fail the profile's
+    quality checks together at the next temperature.
+    """
+    import torch
+    import whisper
+
+    profile = DECODE_PROFILES[profile_name]
+    mels = torch.stack([segment_to_mel(segment) for segment in segments]).to(model.device)
+    texts = [""] * len(segments)
+    remaining = list(range(len(segments)))
+    temperatures = profile["temperature"]
+    for i, temperature in enumerate(temperatures):
+        results = whisper.decode(model, mels[remaining], decoding_options(profile, temperature))
+        retry = []
+        for index, result in zip(remaining, results):
+            texts[index] = result.text.strip()
+            if i < len(temperatures) - 1 and needs_fallback(result):
+                retry.append(index)
+        if not retry:
+            break
+        remaining = retry
+    return texts
+
+
+class RealTimeFactor:
+    """Running ratio of inference time to audio duration; below 1.0 means faster than real time."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.audio_seconds = 0.0
+        self.inference_seconds = 0.0
+
+    def add(self, audio_seconds, inference_seconds):
+        with self.lock:
+            self.audio_seconds += audio_seconds
+            self.inference_seconds += inference_seconds
+
+    @property
+    def value(self):
+        with self.lock:
+            return self.inference_seconds / self.audio_seconds if self.audio_seconds else 0.0
+
+
+class StreamingMelFrontend:
+    """
+    Computes Whisper's log-mel frames incrementally into a ring buffer, so re-decoding a growing window
+    never repeats FFT work. ``latest`` normalises just the slice it returns.
+    """
+
+    def __init__(self, capacity_seconds):
+        self.capacity = int(capacity_seconds * FRAMES_PER_SECOND)
+        self.frames = np.empty((N_MELS, self.capacity), dtype=np.float32)
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(N_FFT) / N_FFT)).astype(np.float32)  # periodic Hann, as torch.hann_window
+        self.filters = None
+        self.reset()
+
+    def reset(self):
+        # Half a window of leading zeros stands in for the centre padding of torch.stft.
+        self.tail = np.zeros(N_FFT // 2, dtype=np.float32)
+        self.total_frames = 0
+
+    def push(self, audio):
+        """Appends float32 16 kHz mono ``audio`` and computes every frame it completes."""
+        if self.filters is None:
+            import whisper
+            self.filters = whisper.audio.mel_filters("cpu", N_MELS).numpy()
+        samples = np.concatenate([self.tail, audio])
+        if len(samples) < N_FFT:
+            self.tail = samples
+            return
+        frame_count = (len(samples) - N_FFT) // HOP_LENGTH + 1
+        windows = np.lib.stride_tricks.sliding_window_view(samples, N_FFT)[::HOP_LENGTH][:frame_count]
+        power = np.abs(np.fft.rfft(windows * self.window, axis=1)) ** 2
+        log_mel = np.log10(np.maximum(self.filters @ power.T, 1e-10)).astype(np.float32)
+        self.write(log_mel[:, -self.capacity:])
+        self.tail = samples[frame_count * HOP_LENGTH:]
+
+    def write(self, log_mel):
+        count = log_mel.shape[1]
+        start = self.total_frames % self.capacity
+        first = min(count, self.capacity - start)
+        self.frames[:, start:start + first] = log_mel[:, :first]
+        self.frames[:, :count - first] = log_mel[:, first:]
+        self.total_frames += count
+
+    def latest(self, seconds):
+        """Returns the normalised mel frames covering the last ``seconds`` of audio."""
+        count = min(int(seconds * FRAMES_PER_SECOND), self.total_frames, self.capacity, N_FRAMES)
+        if count == 0:
+            return np.zeros((N_MELS, 0), dtype=np.float32)
+        end = self.total_frames % self.capacity
+        log_mel = self.frames[:, np.arange(end - count, end) % self.capacity]
+        log_mel = np.maximum(log_mel, log_mel.max() - 8.0)
+        return (log_mel + 4.0) / 4.0
+
+
+class LocalWhisperModel:
+    """
+    Runs local Whisper inside the current process. Models are loaded on first use and calls are
+    serialised, since Whisper's decoder hooks are not safe to run concurrently.
+    """
+
+    def __init__(self, model_name, profile_name=DECODE_PROFILE):
+        self.model_name = model_name
+        self.profile_name = profile_name
+        self.models = {}
+        self.lock = threading.Lock()
+        self.rtf = RealTimeFactor()
+        self.device = self.get_model(model_name).device
+
+    def get_model(self, model_name):
+        if model_name not in self.models:
+            self.models[model_name] = load_model(model_name)
+        return self.models[model_name]
+
+    def transcribe(self, segment, model_name=None):
+        with self.lock:
+            model = self.get_model(model_name or self.model_name)
+            start = time.perf_counter()
+            text = decode_batch(model, [segment], self.profile_name)[0]
+            self.rtf.add(segment_seconds(segment), time.perf_counter() - start)
+        return text
+
+    def real_time_factor(self):
+        return self.rtf.value
+
+    def close(self):
+        print(f"[INFO] Local Whisper real-time factor: {self.real_time_factor():.2f}")
+
+
+def inference_worker(model_name, profile_name, connection):
+    """
+    Entry point of the inference process. Serves ``(request_id, model_name, segment)`` requests from
+    ``connection``, one batch per model for requests that arrive together, until it receives ``None``.
+    """
+    try:
+        models = {model_name: load_model(model_name)}
+        decode_batch(models[model_name], [np.zeros(WARMUP_SECONDS * WHISPER_SAMPLE_RATE, dtype=np.float32)],
+                     profile_name)
+    except Exception as e:
+        connection.send(("error", repr(e)))
+        return
+    connection.send(("ready", str(models[model_name].device)))
+
+    running = True
+    while running:
+        try:
+            message = connection.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        batch = [message]
+        while len(batch) < MAX_BATCH_SIZE and connection.poll(BATCH_WINDOW_SECONDS):
+            message = connection.recv()
+            if message is None:
+                running = False
+                break
+            batch.append(message)
+
+        batches_by_model = {}
+        for request_id, requested_model, segment in batch:
+            batches_by_model.setdefault(requested_model, []).append((request_id, segment))
+
+        results = []
+        inference_seconds = 0.0
+        for requested_model, requests in batches_by_model.items():
+            request_ids = [request_id for request_id, _ in requests]
+            try:
+                if requested_model not in models:
+                    models[requested_model] = load_model(requested_model)
+                start = time.perf_counter()
+                texts = decode_batch(models[requested_model], [segment for _, segment in requests], profile_name)
+                inference_seconds += time.perf_counter() - start
+                results.extend((request_id, text, None) for request_id, text in zip(request_ids, texts))
+            except Exception as e:
+                results.extend((request_id, None, repr(e)) for request_id in request_ids)
+        connection.send(("results", results, inference_seconds))
+
+
+def wait_for_message(connection, process):
+    """Waits for ``connection`` to have data. Returns False if ``process`` exits first with nothing sent."""
+    while not connection.poll(PROCESS_POLL_SECONDS):
+        if not process.is_alive():
+            return connection.poll()
+    return True
+
+
+class WhisperProcessClient:
+    """
+    Runs local Whisper in a persistent process, so inference never competes with the Qt thread for the GIL.
+    ``transcribe`` is thread-safe, and fails with ``TranscriptionFailed`` if the process dies or hangs.
+    """
+
+    def __init__(self, model_name, profile_name=DECODE_PROFILE):
+        self.model_name = model_name
+        self.profile_name = profile_name
+        self.rtf = RealTimeFactor()
+        self.send_lock = threading.Lock()
+        self.request_ids = itertools.count()
+        self.start()
+
+    def start(self):
+        """Starts the inference process and blocks until the model is loaded and warmed up."""
+        context = mp.get_context("spawn")
+        connection, child_connection = context.Pipe()
+        process = context.Process(target=inference_worker, args=(self.model_name, self.profile_name, child_connection),
+                                  daemon=True)
+        process.start()
+        child_connection.close()
+
+        try:
+            if not wait_for_message(connection, process):
+                raise EOFError
+            status, device = connection.recv()
+        except (EOFError, OSError):
+            process.join()
+            raise RuntimeError(f"Local Whisper inference process exited during startup (exit code {process.exitcode})")
+        if status == "error":
+            process.join()
+            raise RuntimeError(f"Local Whisper inference process failed to start: {device}")
+
+        self.connection = connection
+        self.process = process
+        self.device = device
+        self.futures = {}
+        self.reader = threading.Thread(target=self.read_results, args=(connection, process, self.futures), daemon=True)
+        self.reader.start()
+
+    def transcribe(self, segment, model_name=None, timeout=INFERENCE_TIMEOUT_SECONDS):
+        """
+        Transcribes ``segment`` and returns the text. ``segment`` is either float32 16 kHz mono audio
+        or normalised mel frames from ``StreamingMelFrontend``, at most 30 seconds either way.
+        """
+        future = Future()
+        future.audio_seconds = segment_seconds(segment)
+        with self.send_lock:
+            if not self.process.is_alive():
+                print(f"[WARN] Local Whisper inference process exited (exit code {self.process.exitcode}), restarting it.")
+                self.start()
+            request_id = next(self.request_ids)
+            futures, process = self.futures, self.process
+            futures[request_id] = future
+            try:
+                self.connection.send((request_id, model_name or self.model_name, np.ascontiguousarray(segment, dtype=np.float32)))
+            except (OSError, ValueError) as e:
+                futures.pop(request_id, None)
+                raise TranscriptionFailed(f"Local Whisper inference process is gone: {e}") from e
+        try:
+            return future.result(timeout)
+        except FuturesTimeout:
+            # A process that stops answering is hung, not busy: killing it fails every request it holds,
+            # and the next request starts a fresh one.
+            futures.pop(request_id, None)
+            print(f"[ERROR] Local Whisper gave no result in {timeout}s, killing the inference process.")
+            process.kill()
+            process.join()
+            raise TranscriptionFailed(f"Local Whisper gave no result in {timeout}s") from None
+
+    def read_results(self, connection, process, futures):
+        while True:
+            try:
+                if not wait_for_message(connection, process):
+                    break
+                _, results, inference_seconds = connection.recv()
+            except (EOFError, OSError):
+                break
+            audio_seconds = 0.0
+            for request_id, text, error in results:
+                future = futures.pop(request_id, None)
+                if future is None:
+                    continue
+                audio_seconds += future.audio_seconds
+                if error is None:
+                    future.set_result(text)
+                else:
+                    future.set_exception(TranscriptionFailed(f"Local Whisper inference failed: {error}"))
+            self.rtf.add(audio_seconds, inference_seconds)
+
+        connection.close()
+        process.join(PROCESS_POLL_SECONDS)
+        for request_id in list(futures):
+            future = futures.pop(request_id, None)
+            if future is not None:
+                future.set_exception(TranscriptionFailed(
+                    f"Local Whisper inference process exited (exit code {process.exitcode})."))
+
+    def real_time_factor(self):
+        return self.rtf.value
+
+    def close(self):
+        print(f"[INFO] Local Whisper real-time factor: {self.real_time_factor():.2f}")
+        try:
+            with self.send_lock:
+                self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=5)
@@ -0,0 +1,127 @@
+import threading
+from bisect import bisect_left, bisect_right
+
+
+class Segment:
+    """One transcript line, as decoded up to ``time`` from the phrase that started at ``start``. Never changed once stored."""
+    __slots__ = ("speaker", "start", "time", "text", "final")
+
+    def __init__(self, speaker, start, time, text, final=True):
+        self.speaker = speaker
+        self.start = start
+        self.time = time
+        self.text = text
+        self.final = final  # False for a draft, which is replaced once the accurate text arrives
+
+    def __repr__(self):
+        return f"Segment({self.speaker!r}, {self.time:%H:%M:%S}, {self.text!r}, final={self.final})"
+
+
+class TranscriptStore:
+    """
+    Every speaker's segments in one list ordered by ``time``. Writers serialize on ``lock`` and make each
+    change with a single list append or slice assignment, so readers never need the lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.segments = []
+        self.times = []  # segments[i].time, to bisect over; only touched by writers
+        self.latest_finals = {}  # speaker -> their latest accurate segment
+        self.drafts = {}  # speaker -> their draft segments
+        self.version = 0
+        self.snapshot_cache = (0, ())
+        self.views = {}
+
+    def snapshot(self):
+        """Returns ``(version, segments)``, the segments as a tuple in time order."""
+        version = self.version  # read before the list, so a snapshot is never older than its version
+        cached_version, segments = self.snapshot_cache
+        if cached_version != version:
+            segments = tuple(self.segments)
+            self.snapshot_cache = (version, segments)
+        return version, segments
+
+    def view(self, key, build):
+        """Returns ``build(segments)``, only calling it again once the transcript has changed."""
+        version, segments = self.snapshot()
+        cached = self.views.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        result = build(segments)
+        self.views[key] = (version, result)
+        return result
+
+    def add_draft(self, speaker, start, time, text):
+        """Replaces the phrase's earlier draft. Returns False if accurate text already covers the phrase."""
+        with self.lock:
+            final = self.latest_finals.get(speaker)
+            if final is not None and final.time >= start:
+                return False
+            drafts = self.drafts.get(speaker, [])
+            segment = Segment(speaker, start, time, text, final=False)
+            self.replace([draft for draft in drafts if draft.start == start], segment)
+            self.drafts[speaker] = [draft for draft in drafts if draft.start != start] + [segment]
+        return True
+
+    def add_final(self, speaker, start, time, text, new_phrase):
+        """
+        Stores accurate text decoded up to ``time``, in place of the speaker's latest accurate segment unless
+        ``new_phrase`` is set, and of every draft of a phrase that had started by ``time``.
+        """
+        with self.lock:
+            final = self.latest_finals.get(speaker)
+            drafts = self.drafts.get(speaker, [])
+            replaced = [draft for draft in drafts if draft.start <= time]
+            if final is not None and not new_phrase:
+                replaced.append(final)
+            segment = Segment(speaker, start, time, text)
+            self.replace(replaced, segment)
+            self.drafts[speaker] = [draft for draft in drafts if draft.start > time]
+            if final is None or final in replaced or time >= final.time:
+                self.latest_finals[speaker] = segment
+
+    def merge_final(self, speaker, start, time, text):
+        """Stores accurate text for a past phrase, in place of a segment decoded for it before, if there is one."""
+        with self.lock:
+            replaced = []
+            for i in range(bisect_right(self.times, time) - 1, -1, -1):
+                if self.times[i] < start:
+                    break
+                if self.segments[i].speaker == speaker:
+                    replaced.append(self.segments[i])
+                    break
+            segment = Segment(speaker, start, time, text)
+            self.replace(replaced, segment)
+            self.drafts[speaker] = [draft for draft in self.drafts.get(speaker, []) if draft not in replaced]
+            final = self.latest_finals.get(speaker)
+            if final is None or final in replaced or time >= final.time:
+                self.latest_finals[speaker] = segment
+
+    def clear(self):
+        with self.lock:
+            self.segments = []
+            self.times = []
+            self.latest_finals = {}
+            self.drafts = {}
+            self.version += 1
+
+    def index(self, segment):
+        i = bisect_left(self.times, segment.time)
+        while self.segments[i] is not segment:
+            i += 1
+        return i
+
+    def replace(self, replaced, segment):
+        """Removes ``replaced`` and inserts ``segment`` in time order, with one slice assignment."""
+        removed = {self.index(item) for item in replaced}
+        start = min(removed | {bisect_right(self.times, segment.time)})
+        kept = [i for i in range(start, len(self.segments)) if i not in removed]
+        tail = [self.segments[i] for i in kept]
+        times = [self.times[i] for i in kept]
+        position = bisect_right(times, segment.time)
+        tail.insert(position, segment)
+        times.insert(position, segment.time)
+        self.segments[start:] = tail
+        self.times[start:] = times
+        self.version += 1
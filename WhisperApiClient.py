@@ -0,0 +1,230 @@
+import asyncio
+import random
+import socket
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import openai
+import requests
+from openai import api_requestor
+from requests.adapters import HTTPAdapter
+
+from custom_speech_recognition.exceptions import TranscriptionFailed
+
+POOL_SIZE = 8  # keep-alive connections to the API, shared by all transcription workers
+REQUEST_TIMEOUT_SECONDS = 15  # per attempt
+REQUEST_DEADLINE_SECONDS = 45  # per chunk, across all attempts
+MAX_RETRIES = 4
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8
+LATENCY_WINDOW = 200  # number of recent successful requests used for latency percentiles
+
+# The API counts as unhealthy once the last HEALTH_WINDOW attempts have a p95 latency or error rate
+# at or above these thresholds.
+HEALTH_WINDOW = 20
+MIN_HEALTH_SAMPLES = 5
+UNHEALTHY_P95_SECONDS = 6
+UNHEALTHY_ERROR_RATE = 0.3
+
+RETRYABLE_ERRORS = (
+    openai.error.RateLimitError,
+    openai.error.Timeout,
+    openai.error.APIConnectionError,
+    openai.error.ServiceUnavailableError,
+    openai.error.TryAgain,
+    openai.error.APIError,
+)
+
+# Failures that mean the API could not be reached at all, as opposed to the API rejecting the request.
+CONNECTION_ERRORS = (openai.error.APIConnectionError, openai.error.Timeout, asyncio.TimeoutError)
+
+
+class DeadlineSession(requests.Session):
+    """
+    A ``requests.Session`` that uses the calling thread's deadline as the timeout, since openai sets none
+    for audio requests.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.local = threading.local()
+
+    def set_timeout(self, timeout):
+        self.local.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs["timeout"] = getattr(self.local, "timeout", REQUEST_TIMEOUT_SECONDS)
+        return super().request(method, url, **kwargs)
+
+
+def is_retryable(error):
+    # 4xx API errors other than rate limits are the request's fault, retrying won't change the answer.
+    return not (isinstance(error, openai.error.APIError) and error.http_status is not None and error.http_status < 500)
+
+
+def is_connection_failure(error):
+    """True if ``error`` is a ``TranscriptionFailed`` caused by the network rather than the API."""
+    return isinstance(error.__cause__, CONNECTION_ERRORS)
+
+
+def api_reachable(timeout=3):
+    # A plain TCP connect is enough to tell whether the network is back, and costs no API quota.
+    host = urlparse(openai.api_base).hostname
+    try:
+        socket.create_connection((host, 443), timeout).close()
+        return True
+    except OSError:
+        return False
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class WhisperApiClient:
+    """
+    Shared Whisper API client with a connection pool, per-request deadlines and jittered exponential backoff.
+    ``transcribe`` raises ``TranscriptionFailed`` once retries or the deadline run out.
+    """
+
+    def __init__(self, api_key, pool_size=POOL_SIZE):
+        openai.api_key = api_key
+        self.session = DeadlineSession()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0))
+        openai.requestssession = self.session
+
+        self.stats_lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.attempts = deque(maxlen=HEALTH_WINDOW)
+
+    def transcribe(self, wav_buffer):
+        deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self.install_session()
+            self.session.set_timeout(min(REQUEST_TIMEOUT_SECONDS, remaining))
+            wav_buffer.seek(0)
+            start = time.monotonic()
+            try:
+                result = openai.Audio.transcribe('whisper-1', file=wav_buffer, language="en")
+            except RETRYABLE_ERRORS as e:
+                if not is_retryable(e):
+                    raise
+                self.record_attempt(False, time.monotonic() - start)
+                last_error = e
+                delay = self.backoff_delay(attempt, e)
+                if attempt == MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    break
+                with self.stats_lock:
+                    self.retries += 1
+                time.sleep(delay)
+                continue
+            self.record_request(time.monotonic() - start)
+            return result['text'].strip()
+
+        self.record_failure()
+        raise TranscriptionFailed(
+            f"Whisper API request failed after {attempt + 1} attempts: {last_error}") from last_error
+
+    def install_session(self):
+        # openai keeps a session per thread, made on the thread's first request, and newer releases replace it
+        # every MAX_SESSION_LIFETIME_SECS. Putting ours back before each request keeps the deadline and the pool.
+        context = api_requestor._thread_context
+        context.session = self.session
+        context.session_create_time = time.time()
+
+    async def atranscribe(self, wav_buffer):
+        """Asyncio version of ``transcribe``, using ``openai.aiosession`` if set. Cancelling it aborts the request."""
+        deadline = time.monotonic() + REQUEST_DEADLINE_SECONDS
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            wav_buffer.seek(0)
+            start = time.monotonic()
+            try:
+                result = await asyncio.wait_for(
+                    openai.Audio.atranscribe('whisper-1', file=wav_buffer, language="en"),
+                    min(REQUEST_TIMEOUT_SECONDS, remaining))
+            except (asyncio.TimeoutError,) + RETRYABLE_ERRORS as e:
+                if not is_retryable(e):
+                    raise
+                self.record_attempt(False, time.monotonic() - start)
+                last_error = e
+                delay = self.backoff_delay(attempt, e)
+                if attempt == MAX_RETRIES or time.monotonic() + delay >= deadline:
+                    break
+                with self.stats_lock:
+                    self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            self.record_request(time.monotonic() - start)
+            return result['text'].strip()
+
+        self.record_failure()
+        raise TranscriptionFailed(
+            f"Whisper API request failed after {attempt + 1} attempts: {last_error}") from last_error
+
+    @staticmethod
+    def backoff_delay(attempt, error):
+        retry_after = (getattr(error, "headers", None) or {}).get("retry-after")
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter keeps the workers from retrying in lockstep after a shared outage.
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+    def record_request(self, latency):
+        with self.stats_lock:
+            self.requests += 1
+            self.latencies.append(latency)
+            self.attempts.append((True, latency))
+
+    def record_attempt(self, ok, latency):
+        with self.stats_lock:
+            self.attempts.append((ok, latency))
+
+    def record_failure(self):
+        with self.stats_lock:
+            self.requests += 1
+            self.failures += 1
+
+    def is_healthy(self):
+        with self.stats_lock:
+            attempts = list(self.attempts)
+        if len(attempts) < MIN_HEALTH_SAMPLES:
+            return True
+        error_rate = sum(not ok for ok, _ in attempts) / len(attempts)
+        p95_latency = percentile([latency for _, latency in attempts], 0.95)
+        return error_rate < UNHEALTHY_ERROR_RATE and p95_latency < UNHEALTHY_P95_SECONDS
+
+    def reset_health(self):
+        with self.stats_lock:
+            self.attempts.clear()
+
+    def get_stats(self):
+        healthy = self.is_healthy()
+        with self.stats_lock:
+            latencies = list(self.latencies)
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "p50_latency": percentile(latencies, 0.5),
+                "p95_latency": percentile(latencies, 0.95),
+                "healthy": healthy,
+            }
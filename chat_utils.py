@@ -1,8 +1,6 @@
 import string
 
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import SystemMessage, HumanMessage, AIMessage
-
+from Backends import load_backend
 from deep_lake_utils import DeepLakeLoader
 
 import prompts
@@ -20,13 +18,14 @@ class GPTChat:
 
         """
         self.messages = []
-        self.chat = ChatOpenAI()
+        self.chat = load_backend("llm")()
+        self.schema = load_backend("llm_messages")
         self.response = ""
 
         if need_db:
             self.db = DeepLakeLoader('data/salestesting.txt')
 
-        self.messages.append(SystemMessage(content=prompts.LIVE_CHAT_PROMPT))
+        self.messages.append(self.schema.SystemMessage(content=prompts.LIVE_CHAT_PROMPT))
 
         self.ai_message = None
 
@@ -42,16 +41,16 @@ class GPTChat:
             str: The response from the chatbot.
 
         """
-        human_message_with_transcript = HumanMessage(content=f'Transcript: {transcript}, ||| User message: {human_message}')
+        human_message_with_transcript = self.schema.HumanMessage(content=f'Transcript: {transcript}, ||| User message: {human_message}')
 
         temp_messages = self.messages.copy()
         temp_messages.append(human_message_with_transcript)
         self.chat.model_name = model
         self.response = self.chat(temp_messages)
 
-        human_message_without_transcript = HumanMessage(content=human_message)
+        human_message_without_transcript = self.schema.HumanMessage(content=human_message)
         self.messages.append(human_message_without_transcript)
-        ai_message = AIMessage(content=self.response.content)
+        ai_message = self.schema.AIMessage(content=self.response.content)
         self.messages.append(ai_message)
 
         return str(ai_message.content)
@@ -68,8 +67,8 @@ class GPTChat:
             str: The objection found in the transcript, or None if no objection was found.
 
         """
-        human_message = HumanMessage(content=transcript)
-        sys_message = SystemMessage(content=prompts.DETECT_OBJECTION_PROMPT)
+        human_message = self.schema.HumanMessage(content=transcript)
+        sys_message = self.schema.SystemMessage(content=prompts.DETECT_OBJECTION_PROMPT)
         response = self.chat([sys_message, human_message])
         return response.content
 
@@ -88,10 +87,10 @@ class GPTChat:
             return None
         else:
             results = self.db.query_db(response)
-            sys_message = SystemMessage(content=prompts.OBJECTION_GUIDELINES_PROMPT)
-            human_message = HumanMessage(content=f'Customer objection: {response}, ||| Relevant guidelines: {results} ||| Transcript: {transcript}')
+            sys_message = self.schema.SystemMessage(content=prompts.OBJECTION_GUIDELINES_PROMPT)
+            human_message = self.schema.HumanMessage(content=f'Customer objection: {response}, ||| Relevant guidelines: {results} ||| Transcript: {transcript}')
             response = self.chat([sys_message, human_message])
-            self.ai_message = AIMessage(content=str(response.content))
+            self.ai_message = self.schema.AIMessage(content=str(response.content))
             return response.content
 
 
@@ -107,11 +106,12 @@ class SavedTranscriptChat:
         Parameters:
             transcript (str): The transcript to use for the chat.
         """
-        self.chat = ChatOpenAI()
+        self.chat = load_backend("llm")()
+        self.schema = load_backend("llm_messages")
         self.messages = []
         self.transcript = transcript
-        self.messages.append(SystemMessage(content=prompts.SAVED_TRANSCRIPT_PROMPT))
-        self.messages.append(HumanMessage(content=f' Transcript of sales call: {transcript}'))
+        self.messages.append(self.schema.SystemMessage(content=prompts.SAVED_TRANSCRIPT_PROMPT))
+        self.messages.append(self.schema.HumanMessage(content=f' Transcript of sales call: {transcript}'))
 
     def message_bot(self, human_message, model):
         """
@@ -126,10 +126,10 @@ class SavedTranscriptChat:
         Returns:
             str: The response from the chatbot.
         """
-        self.messages.append(HumanMessage(content=human_message))
+        self.messages.append(self.schema.HumanMessage(content=human_message))
         self.chat.model_name = model
         response = self.chat(self.messages)
-        ai_message = AIMessage(content=response.content)
+        ai_message = self.schema.AIMessage(content=response.content)
         self.messages.append(ai_message)
         return response.content
 
@@ -11,7 +11,7 @@ import subprocess
 import wave
 import aifc
 import math
-import audioop
+import warnings
 import collections
 import json
 import base64
@@ -34,7 +34,9 @@ from urllib.parse import urlencode
 from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 
-from .audio import AudioData, get_flac_converter
+from . import dsp, pcm
+from .audio import AudioData, PhraseBuffer, get_flac_converter
+from .audiohost import AudioHost
 from .exceptions import (
     RequestError,
     TranscriptionFailed, 
@@ -43,6 +45,8 @@ from .exceptions import (
     WaitTimeoutError,
 )
 from .recognizers import whisper
+from .ringbuffer import RingBuffer
+from .vad import SpectralVAD, VoiceActivityDetector
 
 
 class AudioSource(object):
@@ -71,50 +75,68 @@ class Microphone(AudioSource):
     Higher ``sample_rate`` values result in better audio quality, but also more bandwidth (and therefore, slower recognition). Additionally, some CPUs, such as those in older Raspberry Pi models, can't keep up if this value is too high.
 
     Higher ``chunk_size`` values help avoid triggering on rapidly changing ambient noise, but also makes detection less sensitive. This value, generally, should be left at its default.
+
+    Instead of ``chunk_size``, a latency target can be given as ``latency_ms``, and the chunk size is chosen to hold that many milliseconds at ``SAMPLE_RATE``. Every chunk costs a read and a pass of the ``listen`` loop, so chunks shorter than ``MIN_CHUNK_MILLISECONDS`` trigger a ``RuntimeWarning``: ``python -m custom_speech_recognition.benchmark`` profiles CPU use against latency, and below that the CPU cost rises steeply while the latency saved is negligible next to the pause detection.
+
+    If ``convert_rate`` is given, audio is resampled to that rate as it is read, and if ``downmix`` is true, multi-channel audio is averaged down to mono. ``SAMPLE_RATE``, ``channels`` and ``chunk_size`` then describe the converted audio, while ``device_sample_rate`` and ``device_channels`` keep the device's own format.
+
+    If ``ring_buffer_seconds`` is given, the device is opened in callback mode: PortAudio hands every buffer to a callback that copies it into a ``RingBuffer`` of that many seconds, and reads are served from the ring as ``memoryview`` slices instead of blocking inside PortAudio. Those slices stay valid for ``ring_buffer_seconds`` of further capture, so it should be longer than any phrase the caller keeps. Such a stream can also be interrupted, which lets ``Recognizer.listen_in_background`` wait for phrases without polling.
     """
-    def __init__(self, device_index=None, sample_rate=None, chunk_size=1024, speaker=False, channels = 1):
+    MIN_CHUNK_MILLISECONDS = 10
+    DEFAULT_CHUNK_SIZE = 1024
+
+    def __init__(self, device_index=None, sample_rate=None, chunk_size=None, speaker=False, channels = 1, convert_rate=None, downmix=False, ring_buffer_seconds=None, latency_ms=None):
         assert device_index is None or isinstance(device_index, int), "Device index must be None or an integer"
         assert sample_rate is None or (isinstance(sample_rate, int) and sample_rate > 0), "Sample rate must be None or a positive integer"
-        assert isinstance(chunk_size, int) and chunk_size > 0, "Chunk size must be a positive integer"
+        assert chunk_size is None or (isinstance(chunk_size, int) and chunk_size > 0), "Chunk size must be None or a positive integer"
+        assert latency_ms is None or latency_ms > 0, "Latency must be None or a positive number of milliseconds"
+        assert chunk_size is None or latency_ms is None, "Only one of chunk size and latency can be given"
+        assert convert_rate is None or (isinstance(convert_rate, int) and convert_rate > 0), "Conversion rate must be None or a positive integer"
+        assert ring_buffer_seconds is None or ring_buffer_seconds > 0, "Ring buffer length must be None or a positive number of seconds"
 
-        # set up PyAudio
+        # set up PyAudio, which is shared by every instance and only initialized once
         self.speaker=speaker
-        self.pyaudio_module = self.get_pyaudio()
-        audio = self.pyaudio_module.PyAudio()
-        try:
-            count = audio.get_device_count()  # obtain device count
-            if device_index is not None:  # ensure device index is in range
-                assert 0 <= device_index < count, "Device index out of range ({} devices available; device index should be between 0 and {} inclusive)".format(count, count - 1)
-            if sample_rate is None:  # automatically set the sample rate to the hardware's default sample rate if not specified
-                device_info = audio.get_device_info_by_index(device_index) if device_index is not None else audio.get_default_input_device_info()
-                assert isinstance(device_info.get("defaultSampleRate"), (float, int)) and device_info["defaultSampleRate"] > 0, "Invalid device info returned from PyAudio: {}".format(device_info)
-                sample_rate = int(device_info["defaultSampleRate"])
-        finally:
-            audio.terminate()
+        self.host = AudioHost.get()
+        self.pyaudio_module = self.host.pyaudio_module
+        count = self.host.device_count()  # obtain device count
+        if device_index is not None:  # ensure device index is in range
+            assert 0 <= device_index < count, "Device index out of range ({} devices available; device index should be between 0 and {} inclusive)".format(count, count - 1)
+        if sample_rate is None:  # automatically set the sample rate to the hardware's default sample rate if not specified
+            device_info = self.host.device_info(device_index) if device_index is not None else self.host.default_input_device_info()
+            assert isinstance(device_info.get("defaultSampleRate"), (float, int)) and device_info["defaultSampleRate"] > 0, "Invalid device info returned from PyAudio: {}".format(device_info)
+            sample_rate = int(device_info["defaultSampleRate"])
 
         self.device_index = device_index
         self.format = self.pyaudio_module.paInt16  # 16-bit int sampling
         self.SAMPLE_WIDTH = self.pyaudio_module.get_sample_size(self.format)  # size of each sample
-        self.SAMPLE_RATE = sample_rate  # sampling rate in Hertz
-        self.CHUNK = chunk_size  # number of frames stored in each buffer
-        self.channels = channels
+        self.device_sample_rate = sample_rate  # sampling rate the device is opened at
+        self.device_channels = channels if speaker else 1
+        self.SAMPLE_RATE = convert_rate or sample_rate  # sampling rate in Hertz
+        if latency_ms is not None:
+            chunk_size = self.chunk_size_for_latency(latency_ms, self.SAMPLE_RATE)
+        self.CHUNK = chunk_size or self.DEFAULT_CHUNK_SIZE  # number of frames stored in each buffer
+        chunk_milliseconds = 1000.0 * self.CHUNK / self.SAMPLE_RATE
+        if chunk_milliseconds < self.MIN_CHUNK_MILLISECONDS:
+            warnings.warn("Chunks of {} frames hold only {:.2f} ms of audio at {} Hz, reading and checking them costs a lot of CPU for no latency gain; use at least {} ms".format(
+                self.CHUNK, chunk_milliseconds, self.SAMPLE_RATE, self.MIN_CHUNK_MILLISECONDS), RuntimeWarning, stacklevel=2)
+        self.channels = 1 if downmix else self.device_channels
+        self.taps = []  # callables that get a copy of every buffer read from the device, e.g. an echo reference
+        self.ring_buffer_seconds = ring_buffer_seconds
 
         self.audio = None
         self.stream = None
 
+    @staticmethod
+    def chunk_size_for_latency(latency_ms, sample_rate):
+        """Number of frames that holds ``latency_ms`` milliseconds of audio at ``sample_rate``."""
+        return max(1, int(round(sample_rate * latency_ms / 1000.0)))
+
     @staticmethod
     def get_pyaudio():
         """
-        Imports the pyaudio module and checks its version. Throws exceptions if pyaudio can't be found or a wrong version is installed
+        Returns the pyaudio module, imported and version-checked once by the shared ``AudioHost``. Throws exceptions if pyaudio can't be found or a wrong version is installed
         """
-        try:
-            import pyaudiowpatch as pyaudio
-        except ImportError:
-            raise AttributeError("Could not find PyAudio; check installation")
-        from distutils.version import LooseVersion
-        if LooseVersion(pyaudio.__version__) < LooseVersion("0.2.11"):
-            raise AttributeError("PyAudio 0.2.11 or later is required (found version {})".format(pyaudio.__version__))
-        return pyaudio
+        return AudioHost.get().pyaudio_module
 
     @staticmethod
     def list_microphone_names():
@@ -123,15 +145,8 @@ class Microphone(AudioSource):
 
         The index of each microphone's name in the returned list is the same as its device index when creating a ``Microphone`` instance - if you want to use the microphone at index 3 in the returned list, use ``Microphone(device_index=3)``.
         """
-        audio = Microphone.get_pyaudio().PyAudio()
-        try:
-            result = []
-            for i in range(audio.get_device_count()):
-                device_info = audio.get_device_info_by_index(i)
-                result.append(device_info.get("name"))
-        finally:
-            audio.terminate()
-        return result
+        host = AudioHost.get()
+        return [host.device_info(i).get("name") for i in range(host.device_count())]
 
     @staticmethod
     def list_working_microphones():
@@ -140,65 +155,62 @@ class Microphone(AudioSource):
 
         Each key in the returned dictionary can be passed to the ``Microphone`` constructor to use that microphone. For example, if the return value is ``{3: "HDA Intel PCH: ALC3232 Analog (hw:1,0)"}``, you can do ``Microphone(device_index=3)`` to use that microphone.
         """
-        pyaudio_module = Microphone.get_pyaudio()
-        audio = pyaudio_module.PyAudio()
-        try:
-            result = {}
-            for device_index in range(audio.get_device_count()):
-                device_info = audio.get_device_info_by_index(device_index)
-                device_name = device_info.get("name")
-                assert isinstance(device_info.get("defaultSampleRate"), (float, int)) and device_info["defaultSampleRate"] > 0, "Invalid device info returned from PyAudio: {}".format(device_info)
+        host = AudioHost.get()
+        result = {}
+        for device_index in range(host.device_count()):
+            device_info = host.device_info(device_index)
+            device_name = device_info.get("name")
+            assert isinstance(device_info.get("defaultSampleRate"), (float, int)) and device_info["defaultSampleRate"] > 0, "Invalid device info returned from PyAudio: {}".format(device_info)
+            try:
+                # read audio
+                pyaudio_stream = host.open(
+                    input_device_index=device_index, channels=1, format=host.pyaudio_module.paInt16,
+                    rate=int(device_info["defaultSampleRate"]), input=True
+                )
                 try:
-                    # read audio
-                    pyaudio_stream = audio.open(
-                        input_device_index=device_index, channels=1, format=pyaudio_module.paInt16,
-                        rate=int(device_info["defaultSampleRate"]), input=True
-                    )
-                    try:
-                        buffer = pyaudio_stream.read(1024)
-                        if not pyaudio_stream.is_stopped(): pyaudio_stream.stop_stream()
-                    finally:
-                        pyaudio_stream.close()
-                except Exception:
-                    continue
-
-                # compute RMS of debiased audio
-                energy = -audioop.rms(buffer, 2)
-                energy_bytes = bytes([energy & 0xFF, (energy >> 8) & 0xFF])
-                debiased_energy = audioop.rms(audioop.add(buffer, energy_bytes * (len(buffer) // 2), 2), 2)
-
-                if debiased_energy > 30:  # probably actually audio
-                    result[device_index] = device_name
-        finally:
-            audio.terminate()
+                    buffer = pyaudio_stream.read(1024)
+                    if not pyaudio_stream.is_stopped(): pyaudio_stream.stop_stream()
+                finally:
+                    pyaudio_stream.close()
+            except Exception:
+                continue
+
+            # compute RMS of debiased audio
+            energy = -pcm.rms(buffer, 2)
+            energy_bytes = bytes([energy & 0xFF, (energy >> 8) & 0xFF])
+            debiased_energy = pcm.rms(pcm.add(buffer, energy_bytes * (len(buffer) // 2), 2), 2)
+
+            if debiased_energy > 30:  # probably actually audio
+                result[device_index] = device_name
         return result
 
     def __enter__(self):
         assert self.stream is None, "This audio source is already inside a context manager"
-        self.audio = self.pyaudio_module.PyAudio()
+        self.audio = self.host.audio
 
         try:
-            if self.speaker:
-                p = self.audio
-                self.stream = Microphone.MicrophoneStream(
-                    p.open(
-                        input_device_index=self.device_index,
-                        channels=self.channels,
-                        format=self.format,
-                        rate=self.SAMPLE_RATE,
-                        frames_per_buffer=self.CHUNK,
-                        input=True
-                    )
-                )
-            else:
-                self.stream = Microphone.MicrophoneStream(
-                    self.audio.open(
-                        input_device_index=self.device_index, channels=1, format=self.format,
-                        rate=self.SAMPLE_RATE, frames_per_buffer=self.CHUNK, input=True,
-                    )
-                )
+            ring = None
+            callback_options = {}
+            if self.ring_buffer_seconds is not None:
+                # A whole number of chunks, so that reads of one chunk never straddle the end of the ring.
+                chunk_count = int(math.ceil(self.ring_buffer_seconds * self.device_sample_rate / self.device_chunk_size()))
+                ring = RingBuffer(chunk_count * self.device_chunk_size() * self.SAMPLE_WIDTH * self.device_channels)
+                continue_flag = self.pyaudio_module.paContinue
+
+                def callback(in_data, frame_count, time_info, status):
+                    ring.write(in_data)
+                    return None, continue_flag
+                callback_options["stream_callback"] = callback
+            self.stream = Microphone.MicrophoneStream(
+                self.host.open(
+                    input_device_index=self.device_index, channels=self.device_channels, format=self.format,
+                    rate=self.device_sample_rate, frames_per_buffer=self.device_chunk_size(), input=True,
+                    **callback_options
+                ),
+                self.taps, self, ring
+            )
         except Exception:
-            self.audio.terminate()
+            self.audio = None
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -206,16 +218,52 @@ class Microphone(AudioSource):
             self.stream.close()
         finally:
             self.stream = None
-            self.audio.terminate()
+            self.audio = None  # the host stays initialized for the next stream
+
+    def device_chunk_size(self, chunk_size=None):
+        """Number of device frames that convert to ``chunk_size`` frames of output audio."""
+        return int(math.ceil((chunk_size or self.CHUNK) * self.device_sample_rate / self.SAMPLE_RATE))
 
     class MicrophoneStream(object):
-        def __init__(self, pyaudio_stream):
+        def __init__(self, pyaudio_stream, taps=(), source=None, ring=None):
             self.pyaudio_stream = pyaudio_stream
+            self.taps = taps
+            self.source = source
+            self.ring = ring  # filled by the PortAudio callback in callback mode, None for blocking reads
+            self.interruptible = ring is not None
+            self.ratecv_state = None  # carried between reads so resampling has no seams at buffer edges
 
         def read(self, size):
-            return self.pyaudio_stream.read(size, exception_on_overflow=False)
+            source = self.source
+            if source is None:
+                buffer = self.read_device(size, 2)  # sources always open the device as 16-bit
+            else:
+                buffer = self.read_device(source.device_chunk_size(size), source.SAMPLE_WIDTH * source.device_channels)
+                channels = source.device_channels
+                if source.channels == 1 and channels > 1:
+                    buffer = dsp.downmix(buffer, source.SAMPLE_WIDTH, channels)
+                    channels = 1
+                if source.SAMPLE_RATE != source.device_sample_rate:
+                    buffer, self.ratecv_state = pcm.ratecv(buffer, source.SAMPLE_WIDTH, channels,
+                                                           source.device_sample_rate, source.SAMPLE_RATE,
+                                                           self.ratecv_state)
+            for tap in self.taps:
+                tap(buffer)
+            return buffer
+
+        def read_device(self, frame_count, frame_bytes):
+            if self.ring is None:
+                return self.pyaudio_stream.read(frame_count, exception_on_overflow=False)
+            return self.ring.read(frame_count * frame_bytes)
+
+        def interrupt(self):
+            """Makes a blocked ``read`` return an empty buffer, as if the stream had ended. Only callback-mode streams can be interrupted."""
+            if self.ring is not None:
+                self.ring.close()
 
         def close(self):
+            if self.ring is not None:
+                self.ring.close()
             try:
                 # sometimes, if the stream isn't stopped, closing the stream throws an exception
                 if not self.pyaudio_stream.is_stopped():
@@ -256,7 +304,7 @@ class AudioFile(AudioSource):
         try:
             # attempt to read the file as WAV
             self.audio_reader = wave.open(self.filename_or_fileobject, "rb")
-            self.little_endian = True  # RIFF WAV is a little-endian format (most ``audioop`` operations assume that the frames are stored in little-endian form)
+            self.little_endian = True  # RIFF WAV is a little-endian format (most ``pcm`` operations assume that the frames are stored in little-endian form)
         except (wave.Error, EOFError):
             try:
                 # attempt to read the file as AIFF
@@ -291,21 +339,13 @@ class AudioFile(AudioSource):
                     raise ValueError("Audio file could not be read as PCM WAV, AIFF/AIFF-C, or Native FLAC; check if file is corrupted or in another format")
                 self.little_endian = False  # AIFF is a big-endian format
         assert 1 <= self.audio_reader.getnchannels() <= 2, "Audio must be mono or stereo"
-        self.SAMPLE_WIDTH = self.audio_reader.getsampwidth()
-
-        # 24-bit audio needs some special handling for old Python versions (workaround for https://bugs.python.org/issue12866)
-        samples_24_bit_pretending_to_be_32_bit = False
-        if self.SAMPLE_WIDTH == 3:  # 24-bit audio
-            try: audioop.bias(b"", self.SAMPLE_WIDTH, 0)  # test whether this sample width is supported (for example, ``audioop`` in Python 3.3 and below don't support sample width 3, while Python 3.4+ do)
-            except audioop.error:  # this version of audioop doesn't support 24-bit audio (probably Python 3.3 or less)
-                samples_24_bit_pretending_to_be_32_bit = True  # while the ``AudioFile`` instance will outwardly appear to be 32-bit, it will actually internally be 24-bit
-                self.SAMPLE_WIDTH = 4  # the ``AudioFile`` instance should present itself as a 32-bit stream now, since we'll be converting into 32-bit on the fly when reading
+        self.SAMPLE_WIDTH = self.audio_reader.getsampwidth()  # ``pcm`` handles 24-bit samples directly
 
         self.SAMPLE_RATE = self.audio_reader.getframerate()
         self.CHUNK = 4096
         self.FRAME_COUNT = self.audio_reader.getnframes()
         self.DURATION = self.FRAME_COUNT / float(self.SAMPLE_RATE)
-        self.stream = AudioFile.AudioFileStream(self.audio_reader, self.little_endian, samples_24_bit_pretending_to_be_32_bit)
+        self.stream = AudioFile.AudioFileStream(self.audio_reader, self.little_endian)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -315,10 +355,9 @@ class AudioFile(AudioSource):
         self.DURATION = None
 
     class AudioFileStream(object):
-        def __init__(self, audio_reader, little_endian, samples_24_bit_pretending_to_be_32_bit):
+        def __init__(self, audio_reader, little_endian):
             self.audio_reader = audio_reader  # an audio file object (e.g., a `wave.Wave_read` instance)
             self.little_endian = little_endian  # whether the audio data is little-endian (when working with big-endian things, we'll have to convert it to little-endian before we process it)
-            self.samples_24_bit_pretending_to_be_32_bit = samples_24_bit_pretending_to_be_32_bit  # this is true if the audio is 24-bit audio, but 24-bit audio isn't supported, so we have to pretend that this is 32-bit audio and convert it on the fly
 
         def read(self, size=-1):
             buffer = self.audio_reader.readframes(self.audio_reader.getnframes() if size == -1 else size)
@@ -326,17 +365,9 @@ class AudioFile(AudioSource):
 
             sample_width = self.audio_reader.getsampwidth()
             if not self.little_endian:  # big endian format, convert to little endian on the fly
-                if hasattr(audioop, "byteswap"):  # ``audioop.byteswap`` was only added in Python 3.4 (incidentally, that also means that we don't need to worry about 24-bit audio being unsupported, since Python 3.4+ always has that functionality)
-                    buffer = audioop.byteswap(buffer, sample_width)
-                else:  # manually reverse the bytes of each sample, which is slower but works well enough as a fallback
-                    buffer = buffer[sample_width - 1::-1] + b"".join(buffer[i + sample_width:i:-1] for i in range(sample_width - 1, len(buffer), sample_width))
-
-            # workaround for https://bugs.python.org/issue12866
-            if self.samples_24_bit_pretending_to_be_32_bit:  # we need to convert samples from 24-bit to 32-bit before we can process them with ``audioop`` functions
-                buffer = b"".join(b"\x00" + buffer[i:i + sample_width] for i in range(0, len(buffer), sample_width))  # since we're in little endian, we prepend a zero byte to each 24-bit sample to get a 32-bit sample
-                sample_width = 4  # make sure we thread the buffer as 32-bit audio now, after converting it from 24-bit audio
+                buffer = pcm.byteswap(buffer, sample_width)
             if self.audio_reader.getnchannels() != 1:  # stereo audio
-                buffer = audioop.tomono(buffer, sample_width, 1, 1)  # convert stereo audio data to mono
+                buffer = pcm.tomono(buffer, sample_width, 1, 1)  # convert stereo audio data to mono
             return buffer
 
 
@@ -355,6 +386,9 @@ class Recognizer(AudioSource):
         self.phrase_threshold = 0.3  # minimum seconds of speaking audio before we consider the speaking audio a phrase - values below this are ignored (for filtering out clicks and pops)
         self.non_speaking_duration = 0.5  # seconds of non-speaking audio to keep on both sides of the recording
 
+        self.vad = None  # a ``VoiceActivityDetector`` that phrases must pass, or ``None`` to rely on energy alone
+        self.vad_discarded_seconds = 0.0  # seconds of audio in phrases that ``vad`` rejected
+
     def record(self, source, duration=None, offset=None):
         """
         Records up to ``duration`` seconds of audio from ``source`` (an ``AudioSource`` instance) starting at ``offset`` (or at the beginning if not specified) into an ``AudioData`` instance, which it returns.
@@ -408,7 +442,7 @@ class Recognizer(AudioSource):
             elapsed_time += seconds_per_buffer
             if elapsed_time > duration: break
             buffer = source.stream.read(source.CHUNK)
-            energy = audioop.rms(buffer, source.SAMPLE_WIDTH)  # energy of the audio signal
+            energy = pcm.rms(buffer, source.SAMPLE_WIDTH)  # energy of the audio signal
 
             # dynamically adjust the energy threshold using asymmetric weighted average
             damping = self.dynamic_energy_adjustment_damping ** seconds_per_buffer  # account for different chunk sizes and rates
@@ -452,7 +486,7 @@ class Recognizer(AudioSource):
             frames.append(buffer)
 
             # resample audio to the required sample rate
-            resampled_buffer, resampling_state = audioop.ratecv(buffer, source.SAMPLE_WIDTH, 1, source.SAMPLE_RATE, snowboy_sample_rate, resampling_state)
+            resampled_buffer, resampling_state = pcm.ratecv(buffer, source.SAMPLE_WIDTH, 1, source.SAMPLE_RATE, snowboy_sample_rate, resampling_state)
             resampled_frames.append(resampled_buffer)
             if time.time() - last_check > check_interval:
                 # run Snowboy on the resampled audio
@@ -464,12 +498,14 @@ class Recognizer(AudioSource):
 
         return b"".join(frames), elapsed_time
 
-    def listen(self, source, timeout=None, phrase_time_limit=None, snowboy_configuration=None):
+    def listen(self, source, timeout=None, phrase_time_limit=None, snowboy_configuration=None, phrase_buffer=None):
         """
         Records a single phrase from ``source`` (an ``AudioSource`` instance) into an ``AudioData`` instance, which it returns.
 
         This is done by waiting until the audio has an energy above ``recognizer_instance.energy_threshold`` (the user has started speaking), and then recording until it encounters ``recognizer_instance.pause_threshold`` seconds of non-speaking or there is no more audio input. The ending silence is not included.
 
+        If ``recognizer_instance.vad`` is set, every phrase found this way is also passed through it as a whole, and phrases that hold too little speech are discarded and counted in ``recognizer_instance.vad_discarded_seconds`` instead of being returned.
+
         The ``timeout`` parameter is the maximum number of seconds that this will wait for a phrase to start before giving up and throwing an ``speech_recognition.WaitTimeoutError`` exception. If ``timeout`` is ``None``, there will be no wait timeout.
 
         The ``phrase_time_limit`` parameter is the maximum number of seconds that this will allow a phrase to continue before stopping and returning the part of the phrase processed before the time limit was reached. The resulting audio will be the phrase cut off at the time limit. If ``phrase_timeout`` is ``None``, there will be no phrase time limit.
@@ -477,6 +513,8 @@ class Recognizer(AudioSource):
         The ``snowboy_configuration`` parameter allows integration with `Snowboy <https://snowboy.kitt.ai/>`__, an offline, high-accuracy, power-efficient hotword recognition engine. When used, this function will pause until Snowboy detects a hotword, after which it will unpause. This parameter should either be ``None`` to turn off Snowboy support, or a tuple of the form ``(SNOWBOY_LOCATION, LIST_OF_HOT_WORD_FILES)``, where ``SNOWBOY_LOCATION`` is the path to the Snowboy root directory, and ``LIST_OF_HOT_WORD_FILES`` is a list of paths to Snowboy hotword configuration files (`*.pmdl` or `*.umdl` format).
 
         This operation will always complete within ``timeout + phrase_timeout`` seconds if both are numbers, either by returning the audio data, or by raising a ``speech_recognition.WaitTimeoutError`` exception.
+
+        The phrase is written straight into a ``PhraseBuffer`` as it is read, and the returned ``AudioData`` wraps a ``memoryview`` of it. If ``phrase_buffer`` is given, that buffer is reused, which means the returned audio is only valid until the next phrase is recorded into it.
         """
         assert isinstance(source, AudioSource), "Source must be an audio source"
         assert source.stream is not None, "Audio source must be entered before listening, see documentation for ``AudioSource``; are you using ``source`` outside of a ``with`` statement?"
@@ -494,8 +532,13 @@ class Recognizer(AudioSource):
         # read audio input for phrases until there is a phrase that is long enough
         elapsed_time = 0  # number of seconds of audio read
         buffer = b""  # an empty buffer means that the stream has ended and there is no data left to read
+        frames = collections.deque()  # buffers read before the phrase starts, only referenced until it does
+        phrase = PhraseBuffer() if phrase_buffer is None else phrase_buffer
         while True:
-            frames = collections.deque()
+            # a phrase that was too short is thrown away
+            frames.clear()
+            phrase.clear()
+            buffer_lengths = []  # length of every buffer in the phrase, to cut the trailing silence off again
 
             if snowboy_configuration is None:
                 # store audio input until the phrase starts
@@ -512,7 +555,7 @@ class Recognizer(AudioSource):
                         frames.popleft()
 
                     # detect whether speaking has started on audio input
-                    energy = audioop.rms(buffer, source.SAMPLE_WIDTH)  # energy of the audio signal
+                    energy = pcm.rms(buffer, source.SAMPLE_WIDTH)  # energy of the audio signal
                     if energy > self.energy_threshold: break
 
                     # dynamically adjust the energy threshold using asymmetric weighted average
@@ -528,6 +571,11 @@ class Recognizer(AudioSource):
                 if len(buffer) == 0: break  # reached end of the stream
                 frames.append(buffer)
 
+            # copy the buffers from before the phrase into the phrase buffer, and record the rest straight into it
+            for frame in frames:
+                phrase.append(frame)
+                buffer_lengths.append(len(frame))
+
             # read audio input until the phrase ends
             pause_count, phrase_count = 0, 0
             phrase_start_time = elapsed_time
@@ -539,11 +587,12 @@ class Recognizer(AudioSource):
 
                 buffer = source.stream.read(source.CHUNK)
                 if len(buffer) == 0: break  # reached end of the stream
-                frames.append(buffer)
+                phrase.append(buffer)
+                buffer_lengths.append(len(buffer))
                 phrase_count += 1
 
                 # check if speaking has stopped for longer than the pause threshold on the audio input
-                energy = audioop.rms(buffer, source.SAMPLE_WIDTH)  # unit energy of the audio signal within the buffer
+                energy = pcm.rms(buffer, source.SAMPLE_WIDTH)  # unit energy of the audio signal within the buffer
                 if energy > self.energy_threshold:
                     pause_count = 0
                 else:
@@ -553,13 +602,22 @@ class Recognizer(AudioSource):
 
             # check how long the detected phrase is, and retry listening if the phrase is too short
             phrase_count -= pause_count  # exclude the buffers for the pause before the phrase
-            if phrase_count >= phrase_buffer_count or len(buffer) == 0: break  # phrase is long enough or we've reached the end of the stream, so stop listening
+            if len(buffer) == 0: break  # reached the end of the stream, so stop listening
+            if phrase_count >= phrase_buffer_count and self.phrase_has_speech(phrase.view(), source): break  # phrase is long enough and is speech, so stop listening
 
         # obtain frame data
-        for i in range(pause_count - non_speaking_buffer_count): frames.pop()  # remove extra non-speaking frames at the end
-        frame_data = b"".join(frames)
+        for i in range(pause_count - non_speaking_buffer_count): phrase.truncate(phrase.length - buffer_lengths.pop())  # remove extra non-speaking frames at the end
 
-        return AudioData(frame_data, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        return AudioData(phrase.view(), source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+
+    def phrase_has_speech(self, frame_data, source):
+        """
+        Runs ``self.vad`` over the whole phrase in ``frame_data`` at once. Rejected audio is added to ``self.vad_discarded_seconds``.
+        """
+        if self.vad is None or self.vad.is_speech(frame_data, source.SAMPLE_RATE, source.SAMPLE_WIDTH):
+            return True
+        self.vad_discarded_seconds += len(frame_data) / float(source.SAMPLE_RATE * source.SAMPLE_WIDTH)
+        return False
 
     def listen_in_background(self, source, callback, phrase_time_limit=None):
         """
@@ -570,15 +628,21 @@ class Recognizer(AudioSource):
         Phrase recognition uses the exact same mechanism as ``recognizer_instance.listen(source)``. The ``phrase_time_limit`` parameter works in the same way as the ``phrase_time_limit`` parameter for ``recognizer_instance.listen(source)``, as well.
 
         The ``callback`` parameter is a function that should accept two parameters - the ``recognizer_instance``, and an ``AudioData`` instance representing the captured audio. Note that ``callback`` function will be called from a non-main thread.
+
+        Every phrase is recorded into the same ``PhraseBuffer``, so the ``AudioData`` passed to ``callback`` is only valid until ``callback`` returns. A callback that keeps the audio must copy it, for example with ``bytes(audio.frame_data)``.
         """
         assert isinstance(source, AudioSource), "Source must be an audio source"
         running = [True]
 
         def threaded_listen():
             with source as s:
+                phrase_seconds = (phrase_time_limit or 10) + 2 * self.pause_threshold  # room for a phrase plus the silence around it, the buffer grows if that's not enough
+                phrase_buffer = PhraseBuffer(int(phrase_seconds * s.SAMPLE_RATE) * s.SAMPLE_WIDTH)
+                # an interruptible stream is woken up by the stop function, any other stream is polled every second
+                timeout = None if getattr(s.stream, "interruptible", False) else 1
                 while running[0]:
-                    try:  # listen for 1 second, then check again if the stop function has been called
-                        audio = self.listen(s, 1, phrase_time_limit)
+                    try:  # listen until a phrase arrives, or for 1 second and then check again if the stop function has been called
+                        audio = self.listen(s, timeout, phrase_time_limit, phrase_buffer=phrase_buffer)
                     except WaitTimeoutError:  # listening timed out, just try again
                         pass
                     else:
@@ -586,6 +650,9 @@ class Recognizer(AudioSource):
 
         def stopper(wait_for_stop=True):
             running[0] = False
+            stream = source.stream
+            if stream is not None and getattr(stream, "interruptible", False):
+                stream.interrupt()
             if wait_for_stop:
                 listener_thread.join()  # block until the background thread is done, which can take around 1 second
 
@@ -1,5 +1,4 @@
 import aifc
-import audioop
 import io
 import os
 import platform
@@ -8,6 +7,37 @@ import subprocess
 import sys
 import wave
 
+from . import pcm
+
+
+class PhraseBuffer(object):
+    """
+    Reusable memory that ``Recognizer.listen`` records phrases into, handed out by ``view`` as a ``memoryview``.
+    It's never resized in place, since views of an earlier phrase may still exist.
+    """
+
+    def __init__(self, capacity=0):
+        self.buffer = bytearray(capacity)
+        self.length = 0
+
+    def clear(self):
+        self.length = 0
+
+    def append(self, data):
+        end = self.length + len(data)
+        if end > len(self.buffer):
+            grown = bytearray(max(end, 2 * len(self.buffer)))
+            grown[:self.length] = memoryview(self.buffer)[:self.length]
+            self.buffer = grown
+        self.buffer[self.length:end] = data
+        self.length = end
+
+    def truncate(self, length):
+        self.length = length
+
+    def view(self):
+        return memoryview(self.buffer)[:self.length]
+
 
 class AudioData(object):
     """
@@ -82,13 +112,13 @@ class AudioData(object):
 
         # make sure unsigned 8-bit audio (which uses unsigned samples) is handled like higher sample width audio (which uses signed samples)
         if self.sample_width == 1:
-            raw_data = audioop.bias(
+            raw_data = pcm.bias(
                 raw_data, 1, -128
             )  # subtract 128 from every sample to make them act like signed samples
 
         # resample audio at the desired rate if specified
         if convert_rate is not None and self.sample_rate != convert_rate:
-            raw_data, _ = audioop.ratecv(
+            raw_data, _ = pcm.ratecv(
                 raw_data,
                 self.sample_width,
                 1,
@@ -99,39 +129,18 @@ class AudioData(object):
 
         # convert samples to desired sample width if specified
         if convert_width is not None and self.sample_width != convert_width:
-            if (
-                convert_width == 3
-            ):  # we're converting the audio into 24-bit (workaround for https://bugs.python.org/issue12866)
-                raw_data = audioop.lin2lin(
-                    raw_data, self.sample_width, 4
-                )  # convert audio into 32-bit first, which is always supported
-                try:
-                    audioop.bias(
-                        b"", 3, 0
-                    )  # test whether 24-bit audio is supported (for example, ``audioop`` in Python 3.3 and below don't support sample width 3, while Python 3.4+ do)
-                except (
-                    audioop.error
-                ):  # this version of audioop doesn't support 24-bit audio (probably Python 3.3 or less)
-                    raw_data = b"".join(
-                        raw_data[i + 1 : i + 4]
-                        for i in range(0, len(raw_data), 4)
-                    )  # since we're in little endian, we discard the first byte from each 32-bit sample to get a 24-bit sample
-                else:  # 24-bit audio fully supported, we don't need to shim anything
-                    raw_data = audioop.lin2lin(
-                        raw_data, self.sample_width, convert_width
-                    )
-            else:
-                raw_data = audioop.lin2lin(
-                    raw_data, self.sample_width, convert_width
-                )
+            raw_data = pcm.lin2lin(
+                raw_data, self.sample_width, convert_width
+            )
 
         # if the output is 8-bit audio with unsigned samples, convert the samples we've been treating as signed to unsigned again
         if convert_width == 1:
-            raw_data = audioop.bias(
+            raw_data = pcm.bias(
                 raw_data, 1, 128
             )  # add 128 to every sample to make them act like unsigned samples again
 
-        return raw_data
+        # frame_data may be a view of a buffer that gets reused, callers of this method expect bytes they can keep
+        return raw_data if isinstance(raw_data, bytes) else bytes(raw_data)
 
     def get_wav_data(self, convert_rate=None, convert_width=None, nchannels = 1):
         """
@@ -183,15 +192,7 @@ class AudioData(object):
         )
 
         # the AIFF format is big-endian, so we need to convert the little-endian raw data to big-endian
-        if hasattr(
-            audioop, "byteswap"
-        ):  # ``audioop.byteswap`` was only added in Python 3.4
-            raw_data = audioop.byteswap(raw_data, sample_width)
-        else:  # manually reverse the bytes of each sample, which is slower but works well enough as a fallback
-            raw_data = raw_data[sample_width - 1 :: -1] + b"".join(
-                raw_data[i + sample_width : i : -1]
-                for i in range(sample_width - 1, len(raw_data), sample_width)
-            )
+        raw_data = pcm.byteswap(raw_data, sample_width)
 
         # generate the AIFF-C file contents
         with io.BytesIO() as aiff_file:
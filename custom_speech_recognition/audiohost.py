@@ -0,0 +1,77 @@
+import atexit
+import re
+import threading
+
+MIN_PYAUDIO_VERSION = (0, 2, 11)
+
+
+def load_pyaudio():
+    """
+    Imports the pyaudio module and checks its version. Throws exceptions if pyaudio can't be found or a wrong version is installed
+    """
+    try:
+        import pyaudiowpatch as pyaudio
+    except ImportError:
+        raise AttributeError("Could not find PyAudio; check installation")
+    version = tuple(int(part) for part in re.findall(r"\d+", pyaudio.__version__)[:3])
+    if version < MIN_PYAUDIO_VERSION:
+        raise AttributeError("PyAudio 0.2.11 or later is required (found version {})".format(pyaudio.__version__))
+    return pyaudio
+
+
+class AudioHost(object):
+    """
+    Process-wide PortAudio host shared by every ``Microphone``, initialized on first use with ``AudioHost.get()``.
+    Devices are only enumerated at initialization, so the device table is read once and cached.
+    """
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get(cls):
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self.pyaudio_module = load_pyaudio()
+        self.audio = self.pyaudio_module.PyAudio()
+        self.lock = threading.Lock()  # PortAudio doesn't promise that opening streams is thread-safe
+        self.devices = [self.audio.get_device_info_by_index(i) for i in range(self.audio.get_device_count())]
+        self.default_input = None
+        self.loopback_devices = None
+        atexit.register(self.audio.terminate)
+
+    def device_count(self):
+        return len(self.devices)
+
+    def device_info(self, device_index):
+        return self.devices[device_index]
+
+    def default_input_device_info(self):
+        if self.default_input is None:
+            self.default_input = self.audio.get_default_input_device_info()
+        return self.default_input
+
+    def default_output_device_info(self, host_api_type):
+        """The default output device of the host API ``host_api_type``, e.g. ``paWASAPI``."""
+        host_api = self.audio.get_host_api_info_by_type(host_api_type)
+        return self.devices[host_api["defaultOutputDevice"]]
+
+    def loopback_device_info(self, output_device):
+        """The loopback device that captures what ``output_device`` plays, or None if there isn't one."""
+        if output_device.get("isLoopbackDevice"):
+            return output_device
+        if self.loopback_devices is None:
+            self.loopback_devices = list(self.audio.get_loopback_device_info_generator())
+        for loopback in self.loopback_devices:
+            if output_device["name"] in loopback["name"]:
+                return loopback
+        return None
+
+    def open(self, **kwargs):
+        with self.lock:
+            return self.audio.open(**kwargs)
@@ -0,0 +1,150 @@
+"""
+Times the ``dsp`` functions against ``audioop`` where it's available, and profiles the CPU
+``Recognizer.listen`` uses per second of audio at different chunk sizes.
+
+    python -m custom_speech_recognition.benchmark
+"""
+
+import time
+import timeit
+
+import numpy as np
+
+from . import AudioSource, Microphone, Recognizer, WaitTimeoutError, dsp
+from .audio import PhraseBuffer
+
+try:
+    import audioop
+except ImportError:
+    audioop = None
+
+BENCHMARK_SECONDS = 0.5  # minimum measuring time per case
+SAMPLE_RATE = 48000
+FRAME_SIZE = 320  # 20 ms at 16 kHz, the frame size of the echo suppressor
+CHUNK_SIZES = (2, 1024, 4800)  # speaker loopback used 2 frames per read, the microphone reads 1024
+PROFILE_SAMPLE_RATE = 16000
+PROFILE_SECONDS = 30  # audio listened to per chunk size and device, alternating 2 s of tone and 2 s of silence
+PROFILE_LATENCIES_MS = (0.125, 1, 5, 10, 20, 32, 64, 128, 256)  # 0.125 ms is the old 2-frame loopback chunk
+
+
+def make_audio(seconds, channels=1):
+    rng = np.random.default_rng(0)
+    samples = rng.normal(0, 3000, int(SAMPLE_RATE * seconds) * channels)
+    return np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+
+
+def time_call(function):
+    calls, total = timeit.Timer(function).autorange()
+    while total < BENCHMARK_SECONDS:
+        calls *= 2
+        total = timeit.Timer(function).timeit(calls)
+    return total / calls
+
+
+def chunks(data, chunk_frames, width=2):
+    step = chunk_frames * width
+    return [data[i:i + step] for i in range(0, len(data), step)]
+
+
+def resample_chunks(module, pieces):
+    state = None
+    for piece in pieces:
+        _, state = module.ratecv(piece, 2, 1, SAMPLE_RATE, 16000, state)
+
+
+def cases():
+    second = make_audio(1)
+    view = memoryview(second)
+    yield "rms, 1 s", lambda m: m.rms(view, 2)
+    for chunk_frames in CHUNK_SIZES:
+        pieces = chunks(second, chunk_frames)
+        yield f"rms per {chunk_frames}-frame chunk, 1 s", lambda m, pieces=pieces: [m.rms(p, 2) for p in pieces]
+    frames = chunks(second, FRAME_SIZE)
+    yield (f"rms of every {FRAME_SIZE}-frame frame, 1 s",
+           lambda m: dsp.frame_rms(view, 2, FRAME_SIZE) if m is dsp else [m.rms(f, 2) for f in frames])
+    yield "ratecv 48k -> 16k, 1 s at once", lambda m: m.ratecv(view, 2, 1, SAMPLE_RATE, 16000, None)
+    for chunk_frames in CHUNK_SIZES[1:]:
+        pieces = chunks(second, chunk_frames)
+        yield f"ratecv 48k -> 16k, {chunk_frames}-frame chunks", lambda m, pieces=pieces: resample_chunks(m, pieces)
+    yield "lin2lin 16 -> 32 bit, 1 s", lambda m: m.lin2lin(view, 2, 4)
+    yield "lin2lin 16 -> 24 bit, 1 s", lambda m: m.lin2lin(view, 2, 3)
+    yield "bias, 1 s", lambda m: m.bias(view, 2, 128)
+    yield "lin2ulaw, 1 s", lambda m: m.lin2ulaw(view, 2)
+    stereo = make_audio(1, channels=2)
+    yield "tomono, 1 s stereo", lambda m: m.tomono(stereo, 2, 0.5, 0.5)
+
+
+class ProfileSource(AudioSource):
+    """
+    Stands in for an entered ``Microphone`` whose device delivers ``data`` at ``device_sample_rate`` with
+    ``device_channels`` channels, as fast as it is read. Conversion to 16 kHz mono goes through the real
+    ``MicrophoneStream``, so its cost per read is part of the profile.
+    """
+
+    def __init__(self, data, chunk_size, device_sample_rate, device_channels):
+        self.SAMPLE_RATE = PROFILE_SAMPLE_RATE
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk_size
+        self.channels = 1
+        self.device_sample_rate = device_sample_rate
+        self.device_channels = device_channels
+        self.data = memoryview(data)
+        self.position = 0
+        self.stream = Microphone.MicrophoneStream(self, (), self)
+
+    device_chunk_size = Microphone.device_chunk_size
+
+    def read(self, frame_count, exception_on_overflow=False):
+        buffer = self.data[self.position:self.position + frame_count * self.SAMPLE_WIDTH * self.device_channels]
+        self.position += len(buffer)
+        return buffer
+
+
+def listen_cpu(source):
+    """CPU seconds ``Recognizer.listen`` spends per second of audio from ``source``."""
+    recognizer = Recognizer()
+    recognizer.dynamic_energy_threshold = False
+    phrase_buffer = PhraseBuffer()
+    start = time.process_time()
+    while source.position < len(source.data):
+        try:
+            recognizer.listen(source, 1, 3, phrase_buffer=phrase_buffer)
+        except WaitTimeoutError:
+            pass
+    return (time.process_time() - start) / PROFILE_SECONDS
+
+
+def profile_audio(sample_rate, channels):
+    t = np.arange(sample_rate * PROFILE_SECONDS) / sample_rate
+    tone = (np.sin(2 * np.pi * 220 * t) * 8000 * (t % 4 < 2)).astype("<i2")
+    return np.repeat(tone, channels).tobytes()
+
+
+def profile_listen():
+    """Prints the CPU-vs-latency profile of ``listen`` for a 16 kHz mono mic and a 48 kHz stereo loopback device."""
+    mic = profile_audio(PROFILE_SAMPLE_RATE, 1)
+    loopback = profile_audio(48000, 2)
+    print(f"{'latency':>10} {'chunk':>8} {'reads/s':>9} {'CPU, 16 kHz mono':>18} {'CPU, 48 kHz stereo':>20}")
+    for latency_ms in PROFILE_LATENCIES_MS:
+        chunk_size = Microphone.chunk_size_for_latency(latency_ms, PROFILE_SAMPLE_RATE)
+        mic_cpu = listen_cpu(ProfileSource(mic, chunk_size, PROFILE_SAMPLE_RATE, 1))
+        loopback_cpu = listen_cpu(ProfileSource(loopback, chunk_size, 48000, 2))
+        print(f"{latency_ms:>8}ms {chunk_size:>8} {PROFILE_SAMPLE_RATE / chunk_size:>9.0f} "
+              f"{mic_cpu * 100:>17.2f}% {loopback_cpu * 100:>19.2f}%")
+
+
+def main():
+    print(f"{'case':<42} {'dsp':>12} {'audioop':>12} {'speedup':>8}")
+    for name, case in cases():
+        dsp_time = time_call(lambda: case(dsp))
+        if audioop is None:
+            print(f"{name:<42} {dsp_time * 1e6:>10.1f}us")
+            continue
+        audioop_time = time_call(lambda: case(audioop))
+        print(f"{name:<42} {dsp_time * 1e6:>10.1f}us {audioop_time * 1e6:>10.1f}us {audioop_time / dsp_time:>7.1f}x")
+    print()
+    profile_listen()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+NumPy implementations of the ``audioop`` functions this package relies on, since ``audioop`` was removed in
+Python 3.13. Each takes the same arguments as its ``audioop`` counterpart. Callers go through ``pcm``, which
+only falls back to these once ``audioop`` is gone.
+"""
+
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+SAMPLE_DTYPES = {1: np.int8, 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+RESAMPLER_ZERO_CROSSINGS = 8  # half-width of the resampling filter, in zero crossings of the lower rate
+RESAMPLER_ROLLOFF = 0.9  # filter cutoff as a fraction of the lower rate's Nyquist frequency
+
+
+class error(Exception):
+    pass
+
+
+def check_width(width):
+    if width not in (1, 2, 3, 4):
+        raise error("Size should be 1, 2, 3 or 4")
+
+
+def to_array(fragment, width):
+    """Returns the samples in ``fragment`` as a NumPy array, without copying unless ``width`` is 3."""
+    check_width(width)
+    if len(fragment) % width:
+        raise error("not a whole number of frames")
+    if width != 3:
+        return np.frombuffer(fragment, dtype=SAMPLE_DTYPES[width])
+    raw = np.frombuffer(fragment, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    samples = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+    return (samples << 8) >> 8  # sign-extend from 24 bits
+
+
+def from_array(samples, width):
+    """Packs integer ``samples`` into a fragment of ``width``-byte samples, wrapping like C would."""
+    check_width(width)
+    if width != 3:
+        return samples.astype(SAMPLE_DTYPES[width]).tobytes()
+    return samples.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+
+def clip(samples, width):
+    limit = 1 << (8 * width - 1)
+    return np.clip(samples, -limit, limit - 1)
+
+
+def rms(fragment, width):
+    samples = to_array(fragment, width)
+    if len(samples) == 0:
+        return 0
+    samples = samples.astype(np.float64)
+    return int(math.sqrt(np.dot(samples, samples) / len(samples)))
+
+
+def frame_rms(fragment, width, frame_size):
+    """RMS of every ``frame_size``-sample frame in ``fragment`` at once, as an array. A partial last frame is ignored."""
+    samples = to_array(fragment, width)
+    samples = samples[:len(samples) - len(samples) % frame_size].astype(np.float64).reshape(-1, frame_size)
+    return np.sqrt(np.einsum("ij,ij->i", samples, samples) / frame_size).astype(np.int64)
+
+
+def add(fragment1, fragment2, width):
+    samples1, samples2 = to_array(fragment1, width), to_array(fragment2, width)
+    if len(samples1) != len(samples2):
+        raise error("Lengths should be the same")
+    return from_array(clip(samples1.astype(np.int64) + samples2, width), width)
+
+
+def mul(fragment, width, factor):
+    return from_array(clip(np.floor(to_array(fragment, width) * float(factor)), width).astype(np.int64), width)
+
+
+def bias(fragment, width, bias):
+    # audioop.bias wraps around instead of clipping, which is what unsigned/signed 8-bit conversion relies on.
+    # from_array's narrowing cast wraps the same way.
+    return from_array(to_array(fragment, width).astype(np.int64) + bias, width)
+
+
+def lin2lin(fragment, width, new_width):
+    check_width(new_width)
+    if width == new_width:
+        return bytes(fragment)
+    samples = to_array(fragment, width).astype(np.int64) << (8 * (4 - width))
+    return from_array(samples >> (8 * (4 - new_width)), new_width)
+
+
+def byteswap(fragment, width):
+    check_width(width)
+    return np.frombuffer(fragment, dtype=np.uint8).reshape(-1, width)[:, ::-1].tobytes()
+
+
+def tomono(fragment, width, lfactor, rfactor):
+    samples = to_array(fragment, width).reshape(-1, 2)
+    mono = np.floor(samples[:, 0] * float(lfactor) + samples[:, 1] * float(rfactor))
+    return from_array(clip(mono, width).astype(np.int64), width)
+
+
+def downmix(fragment, width, channels):
+    """Averages interleaved ``channels``-channel audio down to mono."""
+    samples = to_array(fragment, width)
+    samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels)
+    return from_array(samples.mean(axis=1, dtype=np.float64).astype(np.int64), width)
+
+
+ULAW_SEGMENT_ENDS = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+
+
+def lin2ulaw(fragment, width):
+    """Encodes ``fragment`` as G.711 µ-law, one byte per sample, with the same 14-bit rounding as audioop."""
+    samples = ((to_array(fragment, width).astype(np.int64) << (8 * (4 - width))) >> 16) >> 2
+    mask = np.where(samples < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(samples), 8159) + 33
+    segment = np.searchsorted(ULAW_SEGMENT_ENDS, magnitude)
+    codes = (np.minimum(segment, 7) << 4) | ((magnitude >> (segment + 1)) & 0x0F)
+    codes = np.where(segment >= 8, 0x7F, codes) ^ mask
+    return codes.astype(np.uint8).tobytes()
+
+
+def ulaw2lin(fragment, width):
+    codes = ~np.frombuffer(fragment, dtype=np.uint8).astype(np.int64) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = ((((codes & 0x0F) << 3) + 0x84) << exponent) - 0x84
+    samples = np.where(codes & 0x80, -magnitude, magnitude)
+    return from_array((samples << 16) >> (8 * (4 - width)), width)
+
+
+class Resampler:
+    """
+    Polyphase windowed-sinc resampler for interleaved integer audio. Input history and the output
+    phase are carried from one call to the next, so a stream can be resampled buffer by buffer
+    without seams or drift.
+    """
+
+    def __init__(self, width, channels, in_rate, out_rate):
+        divisor = math.gcd(in_rate, out_rate)
+        self.width = width
+        self.channels = channels
+        self.up = out_rate // divisor
+        self.down = in_rate // divisor
+
+        # Lowpass at the lower of the two Nyquist frequencies, designed at the upsampled rate.
+        factor = max(self.up, self.down)
+        taps_per_phase = int(math.ceil(2 * RESAMPLER_ZERO_CROSSINGS * factor / self.up))
+        length = taps_per_phase * self.up
+        cutoff = RESAMPLER_ROLLOFF / (2 * factor)
+        positions = np.arange(length) - (length - 1) / 2
+        prototype = 2 * cutoff * np.sinc(2 * cutoff * positions) * np.kaiser(length, 8.0) * self.up
+        # phases[p, k] weighs the input sample k steps back from an output at upsampled phase p.
+        self.phases = prototype.reshape(taps_per_phase, self.up).T[:, ::-1].copy()
+        self.taps_per_phase = taps_per_phase
+        self.history = np.zeros((taps_per_phase - 1, channels))
+        self.position = 0  # upsampled index of the next output, relative to the next input buffer
+
+    def process(self, fragment):
+        samples = to_array(fragment, self.width).reshape(-1, self.channels)
+        extended = np.concatenate([self.history, samples])
+        count = len(samples)
+
+        # An output needs every input up to the one at or before its position.
+        output_count = max(0, -(-(count * self.up - self.position) // self.down))
+        output = np.empty((output_count, self.channels))
+        if output_count == 0:  # e.g. the empty read at the end of a stream
+            self.position -= count * self.up
+            self.history = extended[len(extended) - (self.taps_per_phase - 1):]
+            return b""
+        # windows[i] is the input that ends at extended[i + taps_per_phase - 1], as a view, nothing is copied.
+        windows = sliding_window_view(extended, self.taps_per_phase, axis=0)
+        # Every ``up``-th output uses the same phase and starts ``down`` inputs further on, so each phase is
+        # one strided matrix-vector product.
+        for first in range(min(self.up, output_count)):
+            position = self.position + self.down * first
+            rows = output[first::self.up]
+            rows[:] = windows[position // self.up::self.down][:len(rows)] @ self.phases[position % self.up]
+
+        self.position += self.down * output_count - count * self.up
+        self.history = extended[len(extended) - (self.taps_per_phase - 1):]
+        return from_array(clip(np.round(output), self.width).astype(np.int64).reshape(-1), self.width)
+
+
+def ratecv(fragment, width, nchannels, inrate, outrate, state, weightA=1, weightB=0):
+    """
+    Same calling convention as ``audioop.ratecv``: returns ``(fragment, state)``, and ``state``
+    should be passed back in for the next fragment of the same stream. ``weightA`` and ``weightB``
+    are accepted for compatibility but unused, the filter is fixed.
+    """
+    if state is None:
+        state = Resampler(width, nchannels, inrate, outrate)
+    return state.process(fragment), state
@@ -0,0 +1,16 @@
+"""
+The ``audioop`` functions this package calls on every buffer. They come from ``audioop`` itself while it is in the
+standard library, since its C loops beat NumPy's per-call overhead on small buffers, and from ``dsp`` once it is
+gone (Python 3.13). Streams resampled with ``ratecv`` must get all their calls from here, the state isn't shared.
+"""
+
+import warnings
+
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        from audioop import add, bias, byteswap, error, lin2lin, lin2ulaw, mul, ratecv, rms, tomono, ulaw2lin
+except ImportError:
+    from .dsp import add, bias, byteswap, error, lin2lin, lin2ulaw, mul, ratecv, rms, tomono, ulaw2lin
+
+__all__ = ["add", "bias", "byteswap", "error", "lin2lin", "lin2ulaw", "mul", "ratecv", "rms", "tomono", "ulaw2lin"]
@@ -0,0 +1,68 @@
+import threading
+
+
+class RingBuffer(object):
+    """
+    Fixed-size byte ring that a PortAudio callback writes into and one consumer reads from. ``read`` blocks
+    until enough bytes are there and returns ``memoryview`` slices where it can, valid until the writer comes
+    round again. Audio the reader falls too far behind on is overwritten and counted in ``overrun_bytes``.
+    """
+
+    def __init__(self, capacity):
+        assert capacity > 0, "Capacity must be a positive integer"
+        self.capacity = capacity
+        self.buffer = bytearray(capacity)
+        self.view = memoryview(self.buffer)
+        self.written = 0  # total bytes ever written, the write position is this modulo capacity
+        self.read_total = 0  # total bytes ever read
+        self.wanted = 0  # bytes the waiting reader needs before it's worth waking
+        self.overrun_bytes = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def write(self, data):
+        data = memoryview(data).cast("B")
+        if len(data) > self.capacity:
+            self.overrun_bytes += len(data) - self.capacity
+            data = data[len(data) - self.capacity:]
+        size = len(data)
+        # The reader never looks past ``written``, so the copy needs no lock.
+        start = self.written % self.capacity
+        first = min(size, self.capacity - start)
+        self.view[start:start + first] = data[:first]
+        self.view[:size - first] = data[first:]
+        with self.condition:
+            self.written += size
+            if self.written - self.read_total > self.capacity:
+                self.overrun_bytes += self.written - self.capacity - self.read_total
+                self.read_total = self.written - self.capacity
+            if self.wanted and self.written - self.read_total >= self.wanted:
+                self.condition.notify()
+
+    def read(self, size):
+        """
+        Returns the next ``size`` bytes, blocking until they have been written. After ``close``, returns
+        whatever is left, which is empty once the ring has been drained.
+        """
+        with self.condition:
+            self.wanted = size
+            while self.written - self.read_total < size and not self.closed:
+                self.condition.wait()
+            self.wanted = 0
+            size = min(size, self.written - self.read_total)
+            start = self.read_total % self.capacity
+            self.read_total += size
+        if start + size <= self.capacity:
+            return self.view[start:start + size]
+        # Wrapped around the end of the ring, the two halves have to be joined into new memory.
+        return bytes(self.view[start:]) + bytes(self.view[:start + size - self.capacity])
+
+    def available(self):
+        with self.condition:
+            return self.written - self.read_total
+
+    def close(self):
+        """Wakes a blocked ``read``, and makes every later one return without waiting."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
@@ -0,0 +1,68 @@
+"""
+Voice-activity detection for ``Recognizer.listen``: once ``listen`` has cut a phrase on energy, the
+``Recognizer.vad`` detector discards it if it holds too little speech.
+"""
+
+import numpy as np
+
+from . import dsp
+
+VAD_FRAME_SECONDS = 0.02
+SPEECH_BAND_HZ = (80, 4000)  # where voiced speech carries most of its energy, low male fundamentals included
+MIN_SPEECH_BAND_RATIO = 0.6  # share of a frame's energy that has to fall in SPEECH_BAND_HZ
+MAX_SPECTRAL_FLATNESS = 0.3  # 1.0 is white noise, voiced speech sits well below it thanks to its harmonics
+MAX_ZERO_CROSSING_RATE = 0.3  # crossings per sample, hiss and clicks cross far more often than voiced speech
+MIN_FRAME_RMS = 100  # frames quieter than this are silence whatever their spectrum looks like
+MIN_SPEECH_SECONDS = 0.2  # speech frames a phrase needs to count as speech
+
+
+class VoiceActivityDetector(object):
+    """
+    Interface for voice-activity detectors. Subclasses implement ``speech_frames``, which classifies a
+    whole block of audio in one call.
+    """
+
+    frame_seconds = VAD_FRAME_SECONDS
+    min_speech_seconds = MIN_SPEECH_SECONDS
+
+    def speech_frames(self, frame_data, sample_rate, sample_width):
+        """
+        Returns a boolean array with one entry per ``frame_seconds`` frame of ``frame_data`` (mono PCM),
+        true where the frame holds speech. A partial last frame is ignored.
+        """
+        raise NotImplementedError("this is an abstract class")
+
+    def speech_seconds(self, frame_data, sample_rate, sample_width):
+        return np.count_nonzero(self.speech_frames(frame_data, sample_rate, sample_width)) * self.frame_seconds
+
+    def is_speech(self, frame_data, sample_rate, sample_width):
+        return self.speech_seconds(frame_data, sample_rate, sample_width) >= self.min_speech_seconds
+
+
+class SpectralVAD(VoiceActivityDetector):
+    """
+    Classifies 20 ms frames as speech by zero-crossing rate, the share of energy between 80 Hz and 4 kHz,
+    and spectral flatness. Fans, hiss and keyboard clicks fail at least one of the three.
+    """
+
+    def speech_frames(self, frame_data, sample_rate, sample_width):
+        frame_size = int(sample_rate * self.frame_seconds)
+        samples = dsp.to_array(frame_data, sample_width)
+        frames = samples[:len(samples) - len(samples) % frame_size].reshape(-1, frame_size).astype(np.float32)
+        if len(frames) == 0:
+            return np.zeros(0, dtype=bool)
+        frames *= 2.0 ** (8 * (2 - sample_width))  # judge loudness on the 16-bit scale, whatever the width
+        frames -= frames.mean(axis=1, keepdims=True)
+
+        loud = np.sqrt((frames ** 2).mean(axis=1)) >= MIN_FRAME_RMS
+        signs = np.signbit(frames)
+        zero_crossing_rate = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_size
+
+        power = np.abs(np.fft.rfft(frames * np.hanning(frame_size).astype(np.float32), axis=1)) ** 2 + 1e-10
+        frequencies = np.fft.rfftfreq(frame_size, 1 / sample_rate)
+        in_band = (frequencies >= SPEECH_BAND_HZ[0]) & (frequencies <= SPEECH_BAND_HZ[1])
+        band_ratio = power[:, in_band].sum(axis=1) / power.sum(axis=1)
+        flatness = np.exp(np.log(power).mean(axis=1)) / power.mean(axis=1)
+
+        return (loud & (zero_crossing_rate <= MAX_ZERO_CROSSING_RATE) & (band_ratio >= MIN_SPEECH_BAND_RATIO)
+                & (flatness <= MAX_SPECTRAL_FLATNESS))
@@ -1,7 +1,7 @@
 import os
 import re
-from langchain.embeddings import OpenAIEmbeddings
-from langchain.vectorstores import DeepLake
+
+from Backends import load_backend
 
 
 class DeepLakeLoader:
@@ -37,7 +37,8 @@ class DeepLakeLoader:
         Returns:
             DeepLake: DeepLake object.
         """
-        return DeepLake(dataset_path=f'deeplake/{self.file_name}', embedding_function=OpenAIEmbeddings(), read_only=True)
+        embeddings = load_backend("embeddings")()
+        return load_backend("vector_store")(dataset_path=f'deeplake/{self.file_name}', embedding_function=embeddings, read_only=True)
 
     def create_db(self):
         """
@@ -48,7 +49,8 @@ class DeepLakeLoader:
         Returns:
             DeepLake: DeepLake object.
         """
-        return DeepLake.from_texts(self.data, OpenAIEmbeddings(), dataset_path=f'deeplake/{self.file_name}')
+        embeddings = load_backend("embeddings")()
+        return load_backend("vector_store").from_texts(self.data, embeddings, dataset_path=f'deeplake/{self.file_name}')
 
     def query_db(self, query):
         """
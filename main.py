@@ -3,18 +3,19 @@ import glob
 import sys
 import queue
 import threading
-import time
 import os
 
 from PyQt5.QtCore import pyqtSlot, QTimer, QThread, pyqtSignal
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QTextEdit, QLineEdit, QLabel, \
-    QTabWidget, QComboBox, QMessageBox, QStyleFactory
+    QTabWidget, QComboBox, QMessageBox, QStyleFactory, QProgressBar
 from PyQt5.QtGui import QFont, QTextCursor, QIcon
 from dotenv import load_dotenv
 
 
 import AudioRecorder
+from CalibrationCache import CalibrationCache
 from AudioTranscriber import AudioTranscriber
+from AsyncTranscription import USE_ASYNC_PIPELINE, AsyncAudioQueue, AsyncTranscriptionPipeline
 from chat_utils import GPTChat, SavedTranscriptChat
 
 
@@ -31,21 +32,59 @@ HTML_MESSAGE_TEMPLATE = """
 <div style='background-color:#e4e4e3; padding:10px; margin:15px; border-radius:15px; color:#333333; font-family:Roboto; font-size:12pt;'><b>"""
 
 class AudioProcess:
-    def __init__(self):
-        self.audio_queue = queue.Queue()
+    """
+    Capture and transcription for a call, started in two steps: ``start_capture`` opens the devices and
+    starts queueing audio, ``start_transcription`` starts draining the queue once the ASR backend is ready.
+    """
+
+    def __init__(self, on_transcript=None):
+        self.on_transcript = on_transcript
+        if USE_ASYNC_PIPELINE:
+            self.audio_queue = AsyncAudioQueue(maxsize=AudioRecorder.MAX_AUDIO_QUEUE_SIZE)
+        else:
+            self.audio_queue = queue.Queue(maxsize=AudioRecorder.MAX_AUDIO_QUEUE_SIZE)
+        self.user_audio_recorder = None
+        self.speaker_audio_recorder = None
+        self.global_transcriber = None
+        self.pipeline = None
 
+    def start_capture(self):
         self.user_audio_recorder = AudioRecorder.DefaultMicRecorder()
-        self.user_audio_recorder.record_into_queue(self.audio_queue)
-
-        time.sleep(.1)
-
         self.speaker_audio_recorder = AudioRecorder.DefaultSpeakerRecorder()
+        # Both devices calibrate at the same time, and a device with a cached threshold doesn't hold up the start.
+        AudioRecorder.calibrate_recorders([self.user_audio_recorder, self.speaker_audio_recorder], CalibrationCache())
+        self.user_audio_recorder.record_into_queue(self.audio_queue)
         self.speaker_audio_recorder.record_into_queue(self.audio_queue)
+        if AudioRecorder.ECHO_SUPPRESSION:
+            self.user_audio_recorder.suppress_echo_from(self.speaker_audio_recorder)
+
+    def start_transcription(self, local_whisper=None):
+        self.global_transcriber = AudioTranscriber(self.user_audio_recorder.source, self.speaker_audio_recorder.source,
+                                                   local_whisper=local_whisper)
+        self.global_transcriber.on_transcript = self.on_transcript
+        for recorder in (self.user_audio_recorder, self.speaker_audio_recorder):
+            self.global_transcriber.add_stats_source(f"{recorder.source_name} recorder", recorder.get_stats)
+        if USE_ASYNC_PIPELINE:
+            self.pipeline = AsyncTranscriptionPipeline(self.global_transcriber)
+            self.pipeline.start(self.audio_queue)
+        else:
+            self.transcribe = threading.Thread(target=self.global_transcriber.transcribe_audio_queue, args=(self.audio_queue,))
+            self.transcribe.daemon = True
+            self.transcribe.start()
+
+    def log_stats(self):
+        if self.global_transcriber is not None:
+            print(f"[INFO] Transcriber stats: {self.global_transcriber.get_stats()}")
 
-        self.global_transcriber = AudioTranscriber(self.user_audio_recorder.source, self.speaker_audio_recorder.source)
-        self.transcribe = threading.Thread(target=self.global_transcriber.transcribe_audio_queue, args=(self.audio_queue,))
-        self.transcribe.daemon = True
-        self.transcribe.start()
+    def stop(self, local_whisper=None):
+        """Stops transcription and shuts down the ASR backend, the local inference process included."""
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        if self.global_transcriber is not None:
+            self.log_stats()
+            self.global_transcriber.stop()
+        elif local_whisper is not None:
+            local_whisper.close()  # loaded by the "asr" stage, but transcription never started
 
 
 class SetupWindow(QWidget):
@@ -107,7 +146,8 @@ class SetupWindow(QWidget):
     def start_chat(self):
         self.speaker_name = self.speaker_name_input.text()
         if self.speaker_name:
-            QMessageBox.information(self, "Initialize", "Click OK, then make some noise from your mic and speaker. This might take a moment.")
+            if AudioRecorder.needs_calibration(CalibrationCache()):
+                QMessageBox.information(self, "Initialize", "Click OK, then make some noise from your mic and speaker. This might take a moment.")
             self.chat_app = ChatApp(self.speaker_name)
             self.chat_app.show()
             self.close()
@@ -141,20 +181,47 @@ class WorkerThread(QThread):
         self.function(*self.args, **self.kwargs)
 
 
+class StartupStage(WorkerThread):
+    """A stage of call startup, run off the GUI thread. Its result or error comes back through a signal."""
+    done = pyqtSignal(str, object)
+    failed = pyqtSignal(str, str)
+
+    def __init__(self, name, function, *args, **kwargs):
+        super().__init__(function, *args, **kwargs)
+        self.name = name
+
+    def run(self):
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            print(f'[ERROR] Startup stage "{self.name}" failed: {e}')
+            self.failed.emit(self.name, str(e))
+            return
+        self.done.emit(self.name, result)
+
+
 class ChatApp(QWidget):
     TRANSCRIPT_CHECK_INTERVAL = 3000
     RESPONSE_CHECK_INTERVAL = 1000
     OBJECTION_CHECK_INTERVAL = 5000
+    STATS_LOG_INTERVAL = 60000
     FILENAME_TIMESTAMP_FORMAT = "%d-%m-%Y_%H-%M-%S"
+    # Startup stages and what the progress bar calls them. All but "transcription" run in parallel, it
+    # starts once "audio" and "asr" are both done; audio is captured and queued in the meantime.
+    STARTUP_STAGES = {"audio": "audio devices", "asr": "speech recognition", "llm": "chat model",
+                      "retrieval": "objection guidelines", "transcription": "transcriber"}
     append_chat_history_signal = pyqtSignal(str)
+    transcript_updated_signal = pyqtSignal()
 
     def __init__(self, speaker_name):
         super().__init__()
         self.append_chat_history_signal.connect(self.append_chat_history)
-        self.chat = GPTChat()
-        self.chat_for_objection_detection = GPTChat(need_db=True) # This is a separate instance of GPTChat used to avoid weird threading issues - better way to do this?
-        self.audio_process = AudioProcess()
-        self.global_transcriber = self.audio_process.global_transcriber
+        self.transcript_updated_signal.connect(self.update_transcript)
+        self.chat = None
+        self.chat_for_objection_detection = None # This is a separate instance of GPTChat used to avoid weird threading issues - better way to do this?
+        # The transcriber pushes updates as they land, drafts included, the timer is kept as a fallback.
+        self.audio_process = AudioProcess(on_transcript=self.transcript_updated_signal.emit)
+        self.global_transcriber = None
 
         self.speaker_name = speaker_name
 
@@ -171,13 +238,76 @@ class ChatApp(QWidget):
         self.timer_for_objection_detection.timeout.connect(self.objection_detection_thread)
         self.timer_for_objection_detection.start(self.OBJECTION_CHECK_INTERVAL)
 
+        self.stats_timer = QTimer()
+        self.stats_timer.timeout.connect(self.audio_process.log_stats)
+        QApplication.instance().aboutToQuit.connect(self.shut_down)
+
         self.model_dict = {0: 'gpt-3.5-turbo',
                            1: 'gpt-4'}
 
         self.transcript = None
         self.sent_to_gpt_count = 0
+        self.stage_results = {}
+        self.pending_stages = set(self.STARTUP_STAGES)
+        self.failed_stages = []
+        self.startup_threads = []
         self.create_widgets()
 
+        self.start_stage("audio", self.audio_process.start_capture)
+        self.start_stage("asr", AudioTranscriber.warm_up)
+        self.start_stage("llm", GPTChat)
+        self.start_stage("retrieval", GPTChat, need_db=True)
+
+    def start_stage(self, name, function, *args, **kwargs):
+        stage = StartupStage(name, function, *args, **kwargs)
+        stage.done.connect(self.on_stage_done)
+        stage.failed.connect(self.on_stage_failed)
+        self.startup_threads.append(stage)
+        stage.start()
+
+    @pyqtSlot(str, object)
+    def on_stage_done(self, name, result):
+        self.stage_results[name] = result
+        self.pending_stages.discard(name)
+        if name == "audio":
+            self.recording_label.setText("Recording.")
+            self.recording_timer.start(1000)
+        elif name == "llm":
+            self.chat = result
+            self.response_label_text = "Listening"
+        elif name == "retrieval":
+            self.chat_for_objection_detection = result
+        elif name == "transcription":
+            self.global_transcriber = self.audio_process.global_transcriber
+            self.update_transcript()
+            self.save_quit_button.setEnabled(True)
+            self.stats_timer.start(self.STATS_LOG_INTERVAL)
+        if name in ("audio", "asr") and "audio" in self.stage_results and "asr" in self.stage_results:
+            self.start_stage("transcription", self.audio_process.start_transcription, self.stage_results["asr"])
+        self.update_startup_progress()
+
+    @pyqtSlot(str, str)
+    def on_stage_failed(self, name, error):
+        self.failed_stages.append(f"{self.STARTUP_STAGES[name]} ({error})")
+        self.pending_stages.discard(name)
+        if name in ("audio", "asr"):
+            self.pending_stages.discard("transcription")
+        self.update_startup_progress()
+
+    def shut_down(self):
+        self.stats_timer.stop()
+        self.audio_process.stop(self.stage_results.get("asr"))
+
+    def update_startup_progress(self):
+        self.startup_progress.setValue(len(self.STARTUP_STAGES) - len(self.pending_stages))
+        if self.failed_stages:
+            self.startup_progress.setFormat("Could not start the " + ", ".join(self.failed_stages))
+        elif self.pending_stages:
+            pending = ", ".join(label for stage, label in self.STARTUP_STAGES.items() if stage in self.pending_stages)
+            self.startup_progress.setFormat(f"Starting {pending}...")
+        else:
+            self.startup_progress.hide()
+
     def create_widgets(self):
         self.setWindowTitle("SalesCopilot")
         self.setWindowIcon(QIcon("app_icon.png"))
@@ -195,18 +325,23 @@ class ChatApp(QWidget):
         self.transcript_box.setReadOnly(True)
 
         self.recording_label = QLabel()
-        self.recording_label.setText("Recording.")
+        self.recording_label.setText("Opening audio devices...")
 
         self.recording_timer = QTimer()
         self.recording_timer.timeout.connect(self.update_recording_label)
-        self.recording_timer.start(1000)
+
+        self.startup_progress = QProgressBar()
+        self.startup_progress.setRange(0, len(self.STARTUP_STAGES))
+        self.update_startup_progress()
 
         self.save_quit_button = QPushButton("Save and quit")
         self.save_quit_button.setFont(QFont("Roboto", 12))
         self.save_quit_button.clicked.connect(self.save_and_quit)
+        self.save_quit_button.setEnabled(False)  # there's no transcript until the transcription stage is done
 
         transcript_layout = QVBoxLayout(transcript_tab)
         transcript_layout.addWidget(self.transcript_box)
+        transcript_layout.addWidget(self.startup_progress)
         transcript_layout.addWidget(self.recording_label)
         transcript_layout.addWidget(self.save_quit_button)
 
@@ -256,12 +391,16 @@ class ChatApp(QWidget):
 
     @pyqtSlot()
     def update_transcript(self):
+        if self.global_transcriber is None:
+            return
         scrollbar = self.transcript_box.verticalScrollBar()
         value = scrollbar.value()
         at_bottom = value == scrollbar.maximum()
 
+        # Draft lines are only shown live, the objection check and the saved file get confirmed text only.
         self.transcript = self.global_transcriber.get_transcript(speakername=self.speaker_name)
-        self.transcript_box.setPlainText(self.transcript)
+        self.transcript_box.setPlainText(
+            self.global_transcriber.get_transcript(speakername=self.speaker_name, include_drafts=True))
 
         if at_bottom:
             scrollbar.setValue(scrollbar.maximum())
@@ -269,6 +408,8 @@ class ChatApp(QWidget):
             scrollbar.setValue(value)
 
     def objection_detection_thread(self):
+        if self.chat is None or self.chat_for_objection_detection is None or self.transcript is None:
+            return
         self.timer_for_objection_detection.stop()
         self.thread_sales = WorkerThread(self.objection_detection)
         self.thread_sales.finished.connect(self.timer_for_objection_detection.start)
@@ -285,7 +426,9 @@ class ChatApp(QWidget):
     @pyqtSlot()
     def on_send(self):
         user_message = self.input_box.text()
-        if user_message:
+        if user_message and self.chat is None:
+            self.response_label_text = "The assistant is still starting, try again in a moment"
+        elif user_message:
             self.input_box.clear()
 
             self.chat_history_box.append(
@@ -306,7 +449,9 @@ class ChatApp(QWidget):
 
     def get_response(self, user_message):
         model_name = self.model_dict[self.chat_version_combo.currentIndex()]
-        transcript = self.global_transcriber.get_transcript(speakername=self.speaker_name)
+        transcript = self.transcript or ""
+        if self.global_transcriber is not None:
+            transcript = self.global_transcriber.get_transcript(speakername=self.speaker_name)
         response = self.chat.message_bot(user_message, transcript, model_name)
 
         self.response_label_text = "Listening"
@@ -315,6 +460,8 @@ class ChatApp(QWidget):
         self.append_chat_history_signal.emit(message)
 
     def save_transcript(self):
+        if self.transcript is None:
+            return
         try:
             transcript = self.transcript
             timestamp = datetime.now().strftime(self.FILENAME_TIMESTAMP_FORMAT)
@@ -0,0 +1,69 @@
+"""
+Fails when importing the app goes over budget or loads a heavy backend eagerly, using ``python -X importtime``.
+
+    python startup_benchmark.py [module ...]
+"""
+import re
+import subprocess
+import sys
+
+STARTUP_MODULES = ("main",)  # what `python main.py` imports before the setup window is shown
+IMPORT_BUDGET_SECONDS = 1.5
+SLOWEST_SHOWN = 20
+# Backends that must only be imported on first use, through Backends.load_backend or inside a function.
+LAZY_MODULES = ("whisper", "torch", "langchain", "deeplake", "vosk", "openai", "aiohttp")
+
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_times(module):
+    """
+    Imports ``module`` in a fresh interpreter and returns ``(name, self_seconds, cumulative_seconds, depth)``
+    for every module it loaded, in the order ``-X importtime`` reports them.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+    times = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            times.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return times
+
+
+def check_module(module):
+    """Prints the import profile of ``module`` and returns the list of problems found."""
+    times = import_times(module)
+    total = sum(self_seconds for _, self_seconds, _, _ in times)
+    print(f"[INFO] import {module}: {total:.3f}s, {len(times)} modules (budget {IMPORT_BUDGET_SECONDS}s)")
+    print(f"{'module':<50} {'self':>9} {'cumulative':>11}")
+    for name, self_seconds, cumulative, _ in sorted(times, key=lambda t: t[2], reverse=True)[:SLOWEST_SHOWN]:
+        print(f"{name:<50} {self_seconds * 1000:>7.1f}ms {cumulative * 1000:>9.1f}ms")
+
+    problems = []
+    if total > IMPORT_BUDGET_SECONDS:
+        problems.append(f"import {module} took {total:.3f}s, over the {IMPORT_BUDGET_SECONDS}s budget")
+    eager = sorted({name.split(".")[0] for name, _, _, _ in times} & set(LAZY_MODULES))
+    if eager:
+        problems.append(f"import {module} loads {', '.join(eager)} eagerly")
+    return problems
+
+
+def main():
+    problems = []
+    for module in sys.argv[1:] or STARTUP_MODULES:
+        try:
+            problems += check_module(module)
+        except RuntimeError as e:
+            problems.append(str(e))
+        print()
+    for problem in problems:
+        print(f"[ERROR] {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
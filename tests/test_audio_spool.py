@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from AudioSpool import AudioSpool, leftover_spools
+from custom_speech_recognition import dsp
+
+
+def pcm(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(-20000, 20000, count, dtype=np.int16).astype("<i2").tobytes()
+
+
+def test_round_trip_keeps_the_audio_to_ulaw_precision(tmp_path):
+    spool = AudioSpool(str(tmp_path))
+    data = pcm(16000)
+    start = datetime(2024, 1, 1, 12)
+    entry = spool.add("You", start, start + timedelta(seconds=1), data, 16000, 2, 1, "so far")
+    assert entry["phrase_start"] == start.isoformat()
+    assert entry["committed_text"] == "so far"
+    assert spool.read(entry) == dsp.ulaw2lin(dsp.lin2ulaw(data, 2), 2)
+    original = np.frombuffer(data, dtype="<i2").astype(np.int64)
+    restored = np.frombuffer(spool.read(entry), dtype="<i2").astype(np.int64)
+    assert np.all(np.abs(original - restored) <= np.abs(original) // 16 + 8)
+
+
+def test_other_sample_widths_are_stored_as_16_bit(tmp_path):
+    spool = AudioSpool(str(tmp_path))
+    data = pcm(1000)
+    now = datetime.now()
+    entry = spool.add("Speaker", now, now, dsp.lin2lin(data, 2, 4), 48000, 4, 2)
+    assert len(spool.read(entry)) == len(data)
+
+
+def test_pending_segments_survive_a_restart(tmp_path):
+    spool = AudioSpool(str(tmp_path))
+    now = datetime.now()
+    first = spool.add("You", now, now, pcm(100, 1), 16000, 2, 1)
+    second = spool.add("Speaker", now, now, pcm(200, 2), 16000, 2, 1)
+    spool.mark_recovered(first)
+
+    reopened = AudioSpool(str(tmp_path))
+    assert len(reopened) == 1
+    assert [entry["id"] for entry in reopened.pending()] == [second["id"]]
+    assert reopened.read(reopened.pending()[0]) == spool.read(second)
+    assert reopened.add("You", now, now, pcm(10), 16000, 2, 1)["id"] == second["id"] + 1
+
+
+def test_files_are_deleted_once_everything_is_recovered(tmp_path):
+    spool = AudioSpool(str(tmp_path))
+    now = datetime.now()
+    entries = [spool.add("You", now, now, pcm(100, seed), 16000, 2, 1) for seed in range(2)]
+    for entry in entries:
+        spool.mark_recovered(entry)
+    assert len(spool) == 0
+    assert list(tmp_path.iterdir()) == []
+    later = spool.add("You", now, now, pcm(100), 16000, 2, 1)
+    assert later["offset"] == 0
+    assert len(AudioSpool(str(tmp_path))) == 1
+
+
+def test_leftover_spools_finds_crashed_sessions(tmp_path):
+    now = datetime.now()
+    crashed = AudioSpool(str(tmp_path / "2024-01-01_09-00-00"))
+    crashed.add("You", now, now, pcm(100), 16000, 2, 1)
+    finished = AudioSpool(str(tmp_path / "2024-01-01_10-00-00"))
+    finished.mark_recovered(finished.add("You", now, now, pcm(100), 16000, 2, 1))
+
+    leftovers = leftover_spools(str(tmp_path))
+    assert [spool.directory for spool in leftovers] == [crashed.directory]
+    assert len(leftovers[0]) == 1
+    assert not (tmp_path / "2024-01-01_10-00-00").exists()
+    assert leftover_spools(str(tmp_path / "missing")) == []
@@ -0,0 +1,26 @@
+import json
+
+from CalibrationCache import CalibrationCache
+
+
+def test_thresholds_persist_per_device(tmp_path):
+    path = str(tmp_path / "calibration.json")
+    cache = CalibrationCache(path)
+    assert cache.get("Microphone") is None
+    cache.set("Microphone", 420.5)
+    cache.set("Speakers [Loopback]", 80)
+    cache.set("Microphone", 380)
+
+    reopened = CalibrationCache(path)
+    assert reopened.get("Microphone") == 380
+    assert reopened.get("Speakers [Loopback]") == 80
+    assert not (tmp_path / "calibration.json.tmp").exists()
+
+
+def test_unreadable_cache_is_ignored(tmp_path):
+    path = tmp_path / "calibration.json"
+    path.write_text("{not json")
+    cache = CalibrationCache(str(path))
+    assert cache.get("Microphone") is None
+    cache.set("Microphone", 300)
+    assert json.loads(path.read_text())["Microphone"]["energy_threshold"] == 300
@@ -0,0 +1,84 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from custom_speech_recognition import dsp, pcm
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", DeprecationWarning)
+    audioop = pytest.importorskip("audioop")
+
+WIDTHS = (1, 2, 3, 4)
+
+
+def fragment(width, count=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, count * width, dtype=np.uint8).tobytes()
+
+
+@pytest.mark.parametrize("width", WIDTHS)
+def test_matches_audioop(width):
+    data, other = fragment(width), fragment(width, seed=1)
+    assert dsp.rms(data, width) == audioop.rms(data, width)
+    assert dsp.add(data, other, width) == audioop.add(data, other, width)
+    assert dsp.mul(data, width, 0.7) == audioop.mul(data, width, 0.7)
+    assert dsp.bias(data, width, 100) == audioop.bias(data, width, 100)
+    assert dsp.byteswap(data, width) == audioop.byteswap(data, width)
+    assert dsp.tomono(data, width, 0.5, 0.5) == audioop.tomono(data, width, 0.5, 0.5)
+    assert dsp.lin2ulaw(data, width) == audioop.lin2ulaw(data, width)
+    for new_width in WIDTHS:
+        assert dsp.lin2lin(data, width, new_width) == audioop.lin2lin(data, width, new_width)
+
+
+@pytest.mark.parametrize("width", WIDTHS)
+def test_ulaw2lin_matches_audioop(width):
+    codes = bytes(range(256))
+    assert dsp.ulaw2lin(codes, width) == audioop.ulaw2lin(codes, width)
+
+
+def test_pcm_prefers_audioop_and_can_fall_back_to_dsp():
+    for name in pcm.__all__:
+        assert getattr(pcm, name) is getattr(audioop, name)
+        assert callable(getattr(dsp, name))
+
+
+def test_rejects_bad_fragments():
+    with pytest.raises(dsp.error):
+        dsp.rms(b"\0" * 3, 2)
+    with pytest.raises(dsp.error):
+        dsp.rms(b"\0" * 5, 5)
+    with pytest.raises(dsp.error):
+        dsp.add(b"\0" * 4, b"\0" * 2, 2)
+
+
+@pytest.mark.parametrize("in_rate, out_rate, channels", [(48000, 16000, 2), (44100, 16000, 1), (16000, 48000, 1)])
+def test_resampler_is_continuous_across_buffers(in_rate, out_rate, channels):
+    data = fragment(2, in_rate * channels // 2, seed=2)
+    whole = dsp.Resampler(2, channels, in_rate, out_rate).process(data)
+
+    resampler = dsp.Resampler(2, channels, in_rate, out_rate)
+    frame_size = 2 * channels
+    pieces, start = [], 0
+    for frames in (1, 7, 480, 1000, 3, 0, 5000):
+        pieces.append(resampler.process(data[start:start + frames * frame_size]))
+        start += frames * frame_size
+    pieces.append(resampler.process(data[start:]))
+    assert b"".join(pieces) == whole
+
+
+def test_resampler_output_length():
+    resampler = dsp.Resampler(2, 1, 48000, 16000)
+    total = sum(len(resampler.process(b"\0\0" * 441)) for _ in range(100)) // 2
+    assert total == 44100 // 3
+
+
+def test_resampler_keeps_a_tone():
+    rate, frequency = 48000, 440
+    tone = (np.sin(2 * np.pi * frequency * np.arange(rate) / rate) * 10000).astype("<i2").tobytes()
+    output = np.frombuffer(dsp.Resampler(2, 1, rate, 16000).process(tone), dtype="<i2").astype(np.float64)
+    expected = np.sin(2 * np.pi * frequency * np.arange(len(output)) / 16000) * 10000
+    # Skip the filter's start-up delay, then compare against the tone at the new rate, delay included.
+    delay = np.argmax(np.correlate(output[:400], expected[:200], mode="valid"))
+    error = output[400:15000] - expected[400 - delay:15000 - delay]
+    assert np.sqrt(np.mean(error ** 2)) < 100
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from AudioTranscriber import MAX_LAG_SECONDS, OVERLOAD_POLICIES, check_overload_policy, overload_chunks
+
+NOW = datetime(2024, 1, 1, 12)
+
+
+def lagging_chunks():
+    ages = (MAX_LAG_SECONDS * 3, MAX_LAG_SECONDS * 2, MAX_LAG_SECONDS / 2, 0)
+    return [(bytes([i]), NOW - timedelta(seconds=age)) for i, age in enumerate(ages)]
+
+
+@pytest.mark.parametrize("policy", OVERLOAD_POLICIES)
+def test_known_policies_are_accepted_locally(policy):
+    check_overload_policy(policy, use_api=False)
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError, match="Unknown OVERLOAD_POLICY"):
+        check_overload_policy("shed", use_api=False)
+
+
+def test_degrade_needs_local_mode():
+    check_overload_policy("merge", use_api=True)
+    check_overload_policy("drop_oldest", use_api=True)
+    with pytest.raises(ValueError, match="USE_API"):
+        check_overload_policy("degrade", use_api=True)
+
+
+def test_merge_keeps_everything():
+    chunks = lagging_chunks()
+    assert overload_chunks(chunks, "merge", NOW) == (chunks, 0, False)
+
+
+def test_drop_oldest_drops_chunks_past_the_lag_limit():
+    chunks = lagging_chunks()
+    assert overload_chunks(chunks, "drop_oldest", NOW) == (chunks[2:], 2, False)
+
+
+def test_drop_oldest_keeps_the_newest_chunk():
+    chunks = lagging_chunks()[:2]
+    assert overload_chunks(chunks, "drop_oldest", NOW) == (chunks[-1:], 1, False)
+
+
+def test_degrade_keeps_everything_on_the_smaller_model():
+    chunks = lagging_chunks()
+    assert overload_chunks(chunks, "degrade", NOW) == (chunks, 0, True)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from custom_speech_recognition import AudioSource, Recognizer
+from custom_speech_recognition.audio import AudioData, PhraseBuffer
+from custom_speech_recognition.ringbuffer import RingBuffer
+
+SAMPLE_RATE = 16000
+CHUNK = 1000  # doesn't divide the phrase's start or length, so it begins and ends mid-chunk
+
+
+class RingStream:
+    """Serves reads as views of a ``RingBuffer``, like a callback-mode ``Microphone`` stream."""
+
+    def __init__(self, data, ring_seconds=3):
+        self.data = data
+        self.position = 0
+        self.ring = RingBuffer(int(SAMPLE_RATE * ring_seconds) * 2)
+
+    def read(self, size):
+        chunk = self.data[self.position:self.position + size * 2]
+        self.position += len(chunk)
+        self.ring.write(chunk)
+        return self.ring.read(len(chunk))
+
+
+class FakeSource(AudioSource):
+    def __init__(self, data):
+        self.SAMPLE_RATE = SAMPLE_RATE
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = CHUNK
+        self.stream = RingStream(data)
+
+
+def speech(seconds, seed):
+    rng = np.random.default_rng(seed)
+    return rng.integers(-8000, 8000, int(SAMPLE_RATE * seconds)).astype("<i2").tobytes()
+
+
+def silence(seconds):
+    return bytes(int(SAMPLE_RATE * seconds) * 2)
+
+
+def non_speaking_bytes(r):
+    return int(np.ceil(r.non_speaking_duration * SAMPLE_RATE / CHUNK)) * CHUNK * 2
+
+
+def recognizer():
+    r = Recognizer()
+    r.energy_threshold = 300
+    r.dynamic_energy_threshold = False
+    return r
+
+
+def test_append_grows_and_keeps_earlier_views():
+    phrase = PhraseBuffer(4)
+    phrase.append(b"abc")
+    first = phrase.view()
+    phrase.append(b"defgh")
+    assert bytes(phrase.view()) == b"abcdefgh"
+    assert bytes(first) == b"abc"
+
+
+def test_truncate_then_append_overwrites_the_tail():
+    phrase = PhraseBuffer()
+    phrase.append(b"hello world")
+    phrase.truncate(5)
+    assert bytes(phrase.view()) == b"hello"
+    phrase.append(b"!")
+    assert bytes(phrase.view()) == b"hello!"
+    phrase.clear()
+    assert bytes(phrase.view()) == b""
+
+
+def test_listen_assembles_the_phrase_across_chunk_boundaries():
+    spoken = speech(1.23, seed=0)
+    data = silence(1.0567) + spoken + silence(2)
+    audio = recognizer().listen(FakeSource(data))
+
+    raw = audio.get_raw_data()
+    assert isinstance(raw, bytes)
+    start = data.find(raw)
+    assert start != -1, "the phrase should be one contiguous run of the input"
+    assert start % (CHUNK * 2) == 0
+    assert raw.find(spoken) != -1
+    # Around the chunks the speech starts and ends in, only non_speaking_duration of silence is kept.
+    kept_bytes = non_speaking_bytes(Recognizer()) + CHUNK * 2
+    assert raw.find(spoken) < kept_bytes
+    assert len(raw) - raw.find(spoken) - len(spoken) < kept_bytes
+
+
+def test_get_raw_data_after_trimming_the_trailing_silence():
+    phrase_buffer = PhraseBuffer(SAMPLE_RATE * 2 * 10)
+    r = recognizer()
+    data = silence(0.5) + speech(1, seed=1) + silence(2) + speech(1, seed=2) + silence(2)
+    source = FakeSource(data)
+
+    audio = r.listen(source, phrase_buffer=phrase_buffer)
+    raw = audio.get_raw_data()
+    assert raw == bytes(audio.frame_data)
+    assert len(raw) == phrase_buffer.length
+    start = data.find(raw)
+    assert 0 <= start < len(silence(0.5))
+    # The pause that ended the phrase was recorded into the buffer, then cut back to non_speaking_duration.
+    speech_end = len(silence(0.5) + speech(1, seed=1))
+    assert speech_end <= start + len(raw) < speech_end + non_speaking_bytes(r) + CHUNK * 2
+    assert audio.get_raw_data(convert_width=1) == AudioData(raw, SAMPLE_RATE, 2).get_raw_data(convert_width=1)
+    assert audio.get_segment(0, 500).get_raw_data() == raw[:SAMPLE_RATE]
+
+    # The next phrase reuses the buffer, bytes taken from the first one are unaffected.
+    second = r.listen(source, phrase_buffer=phrase_buffer)
+    assert data.find(second.get_raw_data()) > start + len(raw)
+    assert raw == data[start:start + len(raw)]
@@ -0,0 +1,138 @@
+import threading
+
+import pytest
+
+from custom_speech_recognition.ringbuffer import RingBuffer
+
+
+def test_read_returns_what_was_written():
+    ring = RingBuffer(16)
+    ring.write(b"abcd")
+    ring.write(b"efgh")
+    assert ring.available() == 8
+    assert bytes(ring.read(6)) == b"abcdef"
+    assert bytes(ring.read(2)) == b"gh"
+    assert ring.available() == 0
+
+
+def test_contiguous_reads_are_views():
+    ring = RingBuffer(16)
+    ring.write(b"abcdefgh")
+    chunk = ring.read(4)
+    assert isinstance(chunk, memoryview)
+    assert chunk.obj is ring.buffer
+
+
+def test_wraparound():
+    ring = RingBuffer(10)
+    ring.write(b"0123456")
+    assert bytes(ring.read(7)) == b"0123456"
+    # Writes 3 bytes at the end of the ring and 4 at the start.
+    ring.write(b"abcdefg")
+    assert ring.buffer[:4] == b"defg"
+    chunk = ring.read(7)
+    assert isinstance(chunk, bytes)
+    assert chunk == b"abcdefg"
+    assert ring.overrun_bytes == 0
+
+
+def test_many_wraparounds_keep_the_stream_intact():
+    ring = RingBuffer(7)
+    stream = bytes(range(256)) * 4
+    received = bytearray()
+    for i in range(0, len(stream), 5):
+        ring.write(stream[i:i + 5])
+        received += ring.read(ring.available())
+    assert received == stream
+    assert ring.overrun_bytes == 0
+
+
+def test_overrun_drops_the_oldest_bytes():
+    ring = RingBuffer(8)
+    ring.write(b"abcdef")
+    ring.write(b"ghijk")
+    assert ring.overrun_bytes == 3
+    assert ring.available() == 8
+    assert bytes(ring.read(8)) == b"defghijk"
+
+
+def test_write_larger_than_capacity_keeps_the_tail():
+    ring = RingBuffer(4)
+    ring.write(b"ab")
+    ring.write(b"cdefghij")
+    # 4 bytes of the write never fit, then "ab" and "cd" were overwritten.
+    assert ring.overrun_bytes == 6
+    assert bytes(ring.read(4)) == b"ghij"
+
+
+def test_overrun_accounting_across_reads():
+    ring = RingBuffer(8)
+    ring.write(b"12345678")
+    ring.read(2)
+    ring.write(b"abc")
+    assert ring.overrun_bytes == 1
+    assert bytes(ring.read(ring.available())) == b"45678abc"
+    ring.write(b"xyz")
+    assert ring.overrun_bytes == 1
+    assert bytes(ring.read(3)) == b"xyz"
+
+
+def test_close_wakes_a_blocked_read():
+    ring = RingBuffer(16)
+    ring.write(b"ab")
+    result = []
+    reader = threading.Thread(target=lambda: result.append(bytes(ring.read(8))))
+    reader.start()
+    reader.join(0.1)
+    assert reader.is_alive()
+    ring.close()
+    reader.join(1)
+    assert result == [b"ab"]
+    assert bytes(ring.read(4)) == b""
+
+
+@pytest.mark.parametrize("chunk_size, read_size", [(3, 5), (64, 16), (7, 7)])
+def test_read_after_write_from_another_thread(chunk_size, read_size):
+    # The ring is big enough that the writer never laps the reader, so nothing may be lost or reordered.
+    stream = bytes(i % 251 for i in range(50000))
+    ring = RingBuffer(len(stream))
+    received = bytearray()
+
+    def reader():
+        while True:
+            chunk = ring.read(read_size)
+            if not chunk:
+                return
+            received.extend(chunk)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(0, len(stream), chunk_size):
+        ring.write(stream[i:i + chunk_size])
+    ring.close()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert received == stream
+    assert ring.overrun_bytes == 0
+
+
+def test_reader_that_falls_behind_sees_the_overrun():
+    ring = RingBuffer(64)
+    writes = 1000
+    done = threading.Event()
+
+    def writer():
+        for i in range(writes):
+            ring.write(bytes([i % 256]) * 8)
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    received = 0
+    while not done.is_set() or ring.available():
+        available = ring.available()
+        if available:
+            received += len(ring.read(min(8, available)))
+    thread.join()
+    # Every byte was either read or counted as overwritten.
+    assert received + ring.overrun_bytes == writes * 8
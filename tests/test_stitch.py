@@ -0,0 +1,72 @@
+import pytest
+
+from AudioTranscriber import STREAM_OVERLAP_SECONDS, AudioTranscriber, stitch_transcripts
+
+SAMPLE_RATE = 16000
+
+
+@pytest.mark.parametrize("committed, text, expected", [
+    ("we walked down to the", "the corner shop", "we walked down to the corner shop"),
+    ("and then she said that we", "said that we should go", "and then she said that we should go"),
+    # A word that only starts like the committed one isn't overlap.
+    ("it was the end", "ending soon", "it was the end ending soon"),
+])
+def test_overlap_on_a_word_boundary(committed, text, expected):
+    assert stitch_transcripts(committed, text) == expected
+
+
+def test_no_overlap():
+    assert stitch_transcripts("first window here", "second window now") == "first window here second window now"
+
+
+def test_empty_sides():
+    assert stitch_transcripts("", "only new text") == "only new text"
+    assert stitch_transcripts("only old text", "") == "only old text"
+
+
+def test_fully_repeated_window():
+    assert stitch_transcripts("the quick brown fox", "the quick brown fox") == "the quick brown fox"
+    assert stitch_transcripts("so the quick brown fox", "Quick brown fox.") == "so the quick brown fox"
+
+
+def test_overlap_differing_in_case_and_punctuation():
+    # The committed wording is kept, the repeated words are dropped from the new text.
+    assert stitch_transcripts("Hello there, my friend.", "my friend, how are you?") == "Hello there, my friend. how are you?"
+    assert stitch_transcripts("i think so", "I think. So what now") == "i think so what now"
+
+
+def test_overlap_is_limited_to_max_overlap_words():
+    committed = "a b c d e"
+    assert stitch_transcripts(committed, "b c d e f", max_overlap_words=4) == "a b c d e f"
+    assert stitch_transcripts(committed, "b c d e f", max_overlap_words=3) == "a b c d e b c d e f"
+
+
+def source_info(seconds, committed_text="", last_text=""):
+    return {
+        "sample_rate": SAMPLE_RATE,
+        "sample_width": 2,
+        "channels": 1,
+        "last_sample": bytes(int(seconds * SAMPLE_RATE) * 2),
+        "committed_text": committed_text,
+        "last_text": last_text,
+    }
+
+
+def test_commit_stream_window_keeps_text_and_overlap_audio():
+    transcriber = AudioTranscriber.__new__(AudioTranscriber)
+    info = source_info(10, committed_text="we walked down to the", last_text="the corner shop and")
+    transcriber.commit_stream_window(info)
+    assert info["committed_text"] == "we walked down to the corner shop and"
+    assert info["last_text"] == ""
+    assert len(info["last_sample"]) == int(STREAM_OVERLAP_SECONDS * SAMPLE_RATE) * 2
+
+    info["last_text"] = "shop and then we left"
+    transcriber.commit_stream_window(info)
+    assert info["committed_text"] == "we walked down to the corner shop and then we left"
+
+
+def test_commit_stream_window_with_a_repeated_window():
+    transcriber = AudioTranscriber.__new__(AudioTranscriber)
+    info = source_info(2, committed_text="Okay, thanks.", last_text="okay thanks")
+    transcriber.commit_stream_window(info)
+    assert info["committed_text"] == "Okay, thanks."
@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+from TranscriptStore import TranscriptStore
+
+T0 = datetime(2024, 1, 1, 12)
+
+
+def at(seconds):
+    return T0 + timedelta(seconds=seconds)
+
+
+def lines(store):
+    return [(segment.speaker, segment.text, segment.final) for segment in store.snapshot()[1]]
+
+
+def test_segments_stay_in_time_order_across_speakers():
+    store = TranscriptStore()
+    store.add_final("You", at(0), at(1), "a", new_phrase=True)
+    store.add_final("Speaker", at(0), at(3), "c", new_phrase=True)
+    store.add_final("You", at(2), at(2), "b", new_phrase=True)
+    assert lines(store) == [("You", "a", True), ("You", "b", True), ("Speaker", "c", True)]
+    assert store.times == sorted(store.times)
+
+
+def test_final_replaces_the_speakers_latest_segment_unless_it_starts_a_phrase():
+    store = TranscriptStore()
+    store.add_final("You", at(0), at(1), "hello", new_phrase=True)
+    store.add_final("Speaker", at(0), at(2), "hi", new_phrase=True)
+    store.add_final("You", at(0), at(3), "hello there", new_phrase=False)
+    assert lines(store) == [("Speaker", "hi", True), ("You", "hello there", True)]
+    store.add_final("You", at(4), at(5), "bye", new_phrase=True)
+    assert lines(store)[-2:] == [("You", "hello there", True), ("You", "bye", True)]
+
+
+def test_drafts_are_replaced_in_place_and_never_cover_accurate_text():
+    store = TranscriptStore()
+    assert store.add_draft("Speaker", at(0), at(1), "dra")
+    assert store.add_draft("Speaker", at(0), at(2), "draft")
+    assert lines(store) == [("Speaker", "draft", False)]
+    store.add_final("Speaker", at(0), at(2), "accurate", new_phrase=True)
+    assert lines(store) == [("Speaker", "accurate", True)]
+    # A late draft for a phrase the accurate text already covers is ignored.
+    assert not store.add_draft("Speaker", at(0), at(3), "late")
+    assert lines(store) == [("Speaker", "accurate", True)]
+
+
+def test_final_keeps_drafts_of_later_phrases():
+    store = TranscriptStore()
+    store.add_draft("Speaker", at(0), at(1), "first")
+    store.add_draft("Speaker", at(5), at(6), "second")
+    store.add_final("Speaker", at(0), at(2), "First.", new_phrase=True)
+    assert lines(store) == [("Speaker", "First.", True), ("Speaker", "second", False)]
+
+
+def test_merge_final_replaces_the_segment_decoded_for_the_phrase():
+    store = TranscriptStore()
+    store.add_final("You", at(0), at(2), "garbled", new_phrase=True)
+    store.add_final("Speaker", at(1), at(3), "reply", new_phrase=True)
+    store.add_final("You", at(10), at(11), "later", new_phrase=True)
+    store.merge_final("You", at(0), at(2), "recovered")
+    assert lines(store) == [("You", "recovered", True), ("Speaker", "reply", True), ("You", "later", True)]
+    # The speaker's latest segment is still the one replaced by the next update.
+    store.add_final("You", at(10), at(12), "later on", new_phrase=False)
+    assert lines(store)[-1] == ("You", "later on", True)
+    assert len(lines(store)) == 3
+
+
+def test_merge_final_inserts_a_phrase_with_nothing_decoded():
+    store = TranscriptStore()
+    store.add_final("You", at(10), at(11), "after", new_phrase=True)
+    store.merge_final("You", at(0), at(2), "before")
+    assert lines(store) == [("You", "before", True), ("You", "after", True)]
+
+
+def test_views_are_rebuilt_only_after_a_change():
+    store = TranscriptStore()
+    builds = []
+
+    def build(segments):
+        builds.append(len(segments))
+        return " ".join(segment.text for segment in segments)
+
+    store.add_final("You", at(0), at(1), "a", new_phrase=True)
+    assert store.view("text", build) == "a"
+    assert store.view("text", build) == "a"
+    store.add_final("You", at(2), at(3), "b", new_phrase=True)
+    assert store.view("text", build) == "a b"
+    assert builds == [1, 2]
+    store.clear()
+    assert store.view("text", build) == ""
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from custom_speech_recognition.vad import SpectralVAD
+
+RATE = 16000
+# F1, F2, F3 in Hz
+VOWELS = {"a": (730, 1090, 2440), "u": (300, 870, 2240), "i": (270, 2290, 3010)}
+
+
+def vowel(f0, formants, seconds=1.0, level=8000):
+    """Glottal pulse harmonics with a -6 dB/octave tilt, shaped by formant resonances."""
+    t = np.arange(int(RATE * seconds)) / RATE
+    signal = np.zeros_like(t)
+    for k in range(1, int(4000 // f0) + 1):
+        frequency = k * f0
+        gain = sum(1 / (1 + ((frequency - formant) / 90) ** 2) for formant in formants) + 0.05
+        signal += gain / k * np.sin(2 * np.pi * frequency * t)
+    return pcm(signal, level)
+
+
+def pcm(signal, level):
+    signal = signal / np.sqrt(np.mean(signal ** 2)) * level
+    return np.clip(signal, -32768, 32767).astype("<i2").tobytes()
+
+
+@pytest.mark.parametrize("name", VOWELS)
+@pytest.mark.parametrize("f0", [100, 110, 120])
+def test_male_vowels_are_speech(name, f0):
+    data = vowel(f0, VOWELS[name])
+    assert SpectralVAD().speech_seconds(data, RATE, 2) >= 0.9
+
+
+@pytest.mark.parametrize("name", VOWELS)
+@pytest.mark.parametrize("f0", [200, 220])
+def test_female_vowels_are_speech(name, f0):
+    assert SpectralVAD().is_speech(vowel(f0, VOWELS[name]), RATE, 2)
+
+
+def test_white_noise_is_not_speech():
+    noise = np.random.default_rng(0).standard_normal(RATE)
+    assert SpectralVAD().speech_seconds(pcm(noise, 8000), RATE, 2) == 0.0
+
+
+def test_hum_below_the_speech_band_is_not_speech():
+    t = np.arange(RATE) / RATE
+    assert not SpectralVAD().is_speech(pcm(np.sin(2 * np.pi * 50 * t), 8000), RATE, 2)
+
+
+def test_quiet_speech_is_silence():
+    assert SpectralVAD().speech_seconds(vowel(120, VOWELS["a"], level=50), RATE, 2) == 0.0